@@ -0,0 +1,54 @@
+"""Local (offline) simulator for the circuits of Let's_play_with_qiskit.
+
+Runs the QASM text returned by `Q_program.get_qasm(...)` in-process with
+NumPy, so the tutorial can be tried without an API token or network.
+
+Only the core (parsing, circuits, specs and the simulator) is imported
+with the package. The API client, asyncio front end, noise models,
+archives and the other extras are imported on first attribute access, so
+short-lived workers that only run circuits start quickly.
+"""
+
+import importlib
+
+from .adder import adder_program, adder_qasm, adder_specs, append_adder
+from .backend import SimulatorError, execute, run_qasm
+from .counts import Counts
+from .gatelog import Circuit, PrefixStates, run_circuit
+from .ir import CircuitIR, emit_qasm
+from .optimize import optimize
+from .qasm import Program, QasmError, parse_qasm
+from .specs import SpecProgram
+
+# public name -> submodule it is imported from on first use
+_LAZY = {
+    "Archive": "archive", "ArchiveWriter": "archive",
+    "run_batch": "batch",
+    "CompileCache": "cache",
+    "execute_async": "jobs", "poll": "jobs", "run_async": "jobs",
+    "exact_probabilities": "exact", "expectation_values": "exact",
+    "marginal_probabilities": "exact",
+    "ChunkedState": "memory", "memory_limit": "memory", "plan": "memory",
+    "plan_specs": "memory",
+    "NoiseModel": "noise", "execute_noisy": "noise", "register_device": "noise",
+    "run_noisy": "noise",
+    "sample_parallel": "parallel",
+    "Profiler": "profiling",
+    "COUPLING_MAPS": "routing", "linear_map": "routing", "route": "routing",
+    "ApiError": "remote", "ApiSession": "remote", "LocalApiServer": "remote",
+    "counts_until": "streaming", "iter_shot_memory": "streaming",
+    "proportion_interval": "streaming", "stream_counts": "streaming",
+    "grid": "sweep", "run_sweep": "sweep",
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module("." + _LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -0,0 +1,119 @@
+"""N-bit adders: the tutorial's half adder generalised to ripple-carry addition.
+
+Uses the Cuccaro (CDKM) ripple-carry adder, which needs only one ancilla:
+with registers cin[1], a[n], b[n] and cout[1] it maps
+
+    |cin=0, a, b, cout=0>  ->  |0, a, (a + b) mod 2^n, carry>
+
+using 2n ccx and 4n + 1 cx gates. The gates can be appended to a
+`QuantumProgram` circuit::
+
+    Q_program = QuantumProgram(specs=adder_specs(32))
+    circuit = Q_program.get_circuit("Adder")
+    regs = [Q_program.get_quantum_registers(r) for r in ("cin", "a", "b", "cout")]
+    append_adder(circuit, *regs, sum_register=Q_program.get_classical_registers("s"))
+
+or built directly for the local simulator (`adder_program`, or
+`adder_qasm` for the QASM text). With basis-state inputs the
+circuit is classical and runs through the bit-propagation shortcut; with
+superposed input bits it runs on the sparse statevector, so 64-bit (130
+qubit) additions work either way::
+
+    local_simulator.run_qasm(adder_program(64, a=2**63, b=2**63 + 5))
+"""
+
+from .ir import emit_qasm
+from .qasm import Program
+
+
+def _maj(c, b, a):
+    return [("cx", (a, b)), ("cx", (a, c)), ("ccx", (c, b, a))]
+
+
+def _uma(c, b, a):
+    return [("ccx", (c, b, a)), ("cx", (a, c)), ("cx", (c, b))]
+
+
+def cuccaro_gates(a, b, cin, cout):
+    """Gate list [(name, qubits)] adding a into b; qubits can be any handles."""
+    n = len(a)
+    if n == 0 or len(b) != n:
+        raise ValueError("a and b must be non-empty and of equal length")
+    gates = _maj(cin, b[0], a[0])
+    for i in range(1, n):
+        gates += _maj(a[i - 1], b[i], a[i])
+    gates.append(("cx", (a[n - 1], cout)))
+    for i in range(n - 1, 0, -1):
+        gates += _uma(a[i - 1], b[i], a[i])
+    gates += _uma(cin, b[0], a[0])
+    return gates
+
+
+def adder_specs(n, name="Adder"):
+    """`QuantumProgram` specs with the registers used by `append_adder`."""
+    return {
+        "name": "Program-adder-%d" % n,
+        "circuits": [{
+            "name": name,
+            "quantum_registers": [
+                {"name": "cin", "size": 1},
+                {"name": "a", "size": n},
+                {"name": "b", "size": n},
+                {"name": "cout", "size": 1},
+            ],
+            "classical_registers": [{"name": "s", "size": n + 1}],
+        }],
+    }
+
+
+def append_adder(circuit, cin, a, b, cout, sum_register=None):
+    """Append the adder to a circuit object (e.g. from `get_circuit`).
+
+    `cin` and `cout` are one-qubit registers, `a` and `b` n-qubit registers.
+    With `sum_register` (n + 1 classical bits) b and the carry are measured.
+    """
+    n = len(a) if hasattr(a, "__len__") else a.size
+    a_bits = [a[i] for i in range(n)]
+    b_bits = [b[i] for i in range(n)]
+    for gate, qubits in cuccaro_gates(a_bits, b_bits, cin[0], cout[0]):
+        getattr(circuit, gate)(*qubits)
+    if sum_register is not None:
+        for i in range(n):
+            circuit.measure(b_bits[i], sum_register[i])
+        circuit.measure(cout[0], sum_register[n])
+    return circuit
+
+
+def adder_program(n, a=0, b=0, superpose_a=(), superpose_b=()):
+    """Compiled n-bit adder with inputs a and b prepared by x gates.
+
+    Bits listed in `superpose_a` / `superpose_b` get an h gate instead, so
+    the circuit adds all the resulting inputs at once. The sum is measured
+    into creg s (s[n] is the carry). The `Program` is built directly, with
+    no QASM text in between.
+    """
+    if a >> n or b >> n:
+        raise ValueError("inputs do not fit in %d bits" % n)
+    program = Program()
+    program.qregs = [("cin", 0, 1), ("a", 1, n), ("b", 1 + n, n), ("cout", 1 + 2 * n, 1)]
+    program.cregs = [("s", 0, n + 1)]
+    program.num_qubits, program.num_clbits = 2 * n + 2, n + 1
+    a_bits = list(range(1, 1 + n))
+    b_bits = list(range(1 + n, 1 + 2 * n))
+    for bits, value, superposed in ((a_bits, a, superpose_a), (b_bits, b, superpose_b)):
+        superposed = set(superposed)
+        for i in range(n):
+            if i in superposed:
+                program.ops.append(("h", (bits[i],), ()))
+            elif value >> i & 1:
+                program.ops.append(("x", (bits[i],), ()))
+    for gate, qubits in cuccaro_gates(a_bits, b_bits, 0, 1 + 2 * n):
+        program.ops.append((gate, qubits, ()))
+    end = len(program.ops)
+    program.measures = [(end, b_bits[i], i) for i in range(n)] + [(end, 1 + 2 * n, n)]
+    return program
+
+
+def adder_qasm(n, a=0, b=0, superpose_a=(), superpose_b=()):
+    """QASM text of `adder_program`."""
+    return emit_qasm(adder_program(n, a, b, superpose_a, superpose_b))
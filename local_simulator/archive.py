@@ -0,0 +1,208 @@
+"""Binary archive of circuits, counts and per-shot results.
+
+`print(result)` and JSON are fine for one tutorial run but slow and large
+for archives with millions of shots. An archive file is::
+
+    b"LSIMARC1" | array data ... | JSON index | index length (uint64) | b"LSIMARC1"
+
+Every array starts on a 64-byte boundary and is described in the index by
+its offset, dtype and shape, so `Archive` opens arrays with `np.memmap`:
+slicing the shots of one circuit only touches those pages of the file::
+
+    with ArchiveWriter("runs.lsim") as out:
+        out.add_circuit("Circuit", program)
+        out.add_counts("Circuit", counts)
+        out.add_memory("Circuit", iter_shot_memory(program, 10**8))
+
+    archive = Archive("runs.lsim")
+    archive.memory("Circuit")[:1000]     # first 1000 register values
+
+Register values wider than 64 bits are stored as several little-endian
+uint64 words per value.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+from .counts import Counts
+from .ir import CircuitIR
+from .qasm import Expression, eval_param
+
+MAGIC = b"LSIMARC1"
+ALIGNMENT = 64
+
+
+def _words(num_clbits):
+    return max(1, (num_clbits + 63) // 64)
+
+
+def _to_words(values, num_clbits):
+    """Register values (ints or an integer array) as a (k, words) uint64 array."""
+    words = _words(num_clbits)
+    values = np.asarray(values)
+    if words == 1 and values.dtype != object:
+        return values.astype(np.uint64).reshape(-1, 1)
+    out = np.empty((len(values), words), dtype=np.uint64)
+    mask = (1 << 64) - 1
+    for row, value in enumerate(values.tolist()):
+        for word in range(words):
+            out[row, word] = (value >> (64 * word)) & mask
+    return out
+
+
+def _from_words(array):
+    if array.shape[1] == 1:
+        return array[:, 0]
+    values = np.empty(len(array), dtype=object)
+    for row, words in enumerate(array.tolist()):
+        values[row] = sum(word << (64 * i) for i, word in enumerate(words))
+    return values
+
+
+class ArchiveWriter(object):
+    """Append arrays to a new archive; the index is written by `close`."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._index = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _entry(self, name):
+        return self._index.setdefault(name, {"arrays": {}, "meta": {}})
+
+    def add_array(self, name, field, array):
+        array = np.ascontiguousarray(array)
+        padding = -self._file.tell() % ALIGNMENT
+        self._file.write(b"\0" * padding)
+        offset = self._file.tell()
+        self._file.write(array.tobytes())
+        self._entry(name)["arrays"][field] = {
+            "offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+
+    def add_circuit(self, name, program):
+        """Store a compiled `Program` (as its `CircuitIR` arrays)."""
+        ir = CircuitIR.from_program(program)
+        for field in ("opcodes", "qubits", "params", "measures"):
+            self.add_array(name, "circuit." + field, getattr(ir, field))
+        objects = []
+        for row, (qubits, params) in sorted(ir.objects.items()):
+            if isinstance(params[0], np.ndarray):
+                self.add_array(name, "circuit.unitary.%d" % row, params[0])
+                objects.append([row, list(qubits), None, []])
+            else:
+                names = set()
+                for p in params:
+                    if isinstance(p, Expression):
+                        names |= p.names
+                objects.append([row, list(qubits),
+                                [p.text if isinstance(p, Expression) else p for p in params],
+                                sorted(names)])
+        self._entry(name)["meta"]["circuit"] = {
+            "num_qubits": ir.num_qubits, "num_clbits": ir.num_clbits,
+            "qregs": ir.qregs, "cregs": ir.cregs, "objects": objects}
+
+    def add_counts(self, name, counts):
+        """Store a `Counts` histogram."""
+        width = counts.num_clbits
+        self.add_array(name, "counts.values", _to_words(counts.values, width))
+        self.add_array(name, "counts.hits", counts.hits)
+        self._entry(name)["meta"]["counts"] = {"cregs": counts.cregs}
+
+    def add_memory(self, name, values, num_clbits=64):
+        """Store the register value of every shot, in shot order.
+
+        `values` is an array or an iterable of array chunks (e.g. from
+        `iter_shot_memory`), written one after another without holding
+        them all in memory.
+        """
+        if isinstance(values, np.ndarray):
+            self.add_array(name, "memory", _to_words(values, num_clbits))
+            return
+        self._file.write(b"\0" * (-self._file.tell() % ALIGNMENT))
+        offset = self._file.tell()
+        rows = 0
+        for chunk in values:
+            chunk = _to_words(chunk, num_clbits)
+            self._file.write(chunk.tobytes())
+            rows += len(chunk)
+        self._entry(name)["arrays"]["memory"] = {
+            "offset": offset, "dtype": np.dtype(np.uint64).str,
+            "shape": [rows, _words(num_clbits)]}
+
+    def close(self):
+        if self._file.closed:
+            return
+        index = json.dumps(self._index).encode("utf-8")
+        self._file.write(index)
+        self._file.write(struct.pack("<Q", len(index)))
+        self._file.write(MAGIC)
+        self._file.close()
+
+
+class Archive(object):
+    """Read-only view of an archive; arrays are memory-mapped on access."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as handle:
+            if handle.read(len(MAGIC)) != MAGIC:
+                raise ValueError("%s is not a local_simulator archive" % path)
+            handle.seek(-(8 + len(MAGIC)), 2)
+            length, = struct.unpack("<Q", handle.read(8))
+            if handle.read(len(MAGIC)) != MAGIC:
+                raise ValueError("%s is truncated" % path)
+            handle.seek(-(8 + len(MAGIC) + length), 2)
+            self._index = json.loads(handle.read(length).decode("utf-8"))
+
+    def names(self):
+        return sorted(self._index)
+
+    def fields(self, name):
+        return sorted(self._index[name]["arrays"])
+
+    def array(self, name, field):
+        info = self._index[name]["arrays"][field]
+        shape = tuple(info["shape"])
+        if 0 in shape:
+            return np.empty(shape, dtype=info["dtype"])
+        return np.memmap(self.path, dtype=info["dtype"], mode="r",
+                         offset=info["offset"], shape=shape)
+
+    def circuit(self, name):
+        """The stored circuit as a `Program`."""
+        meta = self._index[name]["meta"]["circuit"]
+        objects = {}
+        for row, qubits, params, names in meta["objects"]:
+            if params is None:
+                params = (np.array(self.array(name, "circuit.unitary.%d" % row)),)
+            else:
+                params = tuple(eval_param(p, names) if isinstance(p, str) else p
+                               for p in params)
+            objects[row] = (tuple(qubits), params)
+        ir = CircuitIR(meta["num_qubits"], meta["num_clbits"],
+                       [tuple(r) for r in meta["qregs"]], [tuple(r) for r in meta["cregs"]],
+                       np.array(self.array(name, "circuit.opcodes")),
+                       np.array(self.array(name, "circuit.qubits")),
+                       np.array(self.array(name, "circuit.params")),
+                       np.array(self.array(name, "circuit.measures")), objects)
+        return ir.to_program()
+
+    def counts(self, name):
+        meta = self._index[name]["meta"]["counts"]
+        values = _from_words(np.array(self.array(name, "counts.values")))
+        return Counts(values, np.array(self.array(name, "counts.hits")),
+                      [tuple(r) for r in meta["cregs"]])
+
+    def memory(self, name):
+        """Memory-mapped per-shot values: shape (shots,), or (shots, words) if wide."""
+        memory = self.array(name, "memory")
+        return memory[:, 0] if memory.shape[1] == 1 else memory
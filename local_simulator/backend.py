@@ -0,0 +1,183 @@
+"""Offline replacement for the `'simulator'` device used in the tutorial.
+
+Instead of::
+
+    Q_program.set_api(Qconfig.APItoken, Qconfig.config["url"])
+    Q_program.compile(circuits, device)
+    result = Q_program.run(wait=2, timeout=240)
+    Q_program.get_counts("Circuit")
+
+the circuit can be run in-process, without network or Qconfig token::
+
+    import local_simulator
+    local_simulator.execute(Q_program, ["Circuit"])["Circuit"]
+
+The counts use the same keys as `get_counts` (`cr[3]cr[2]cr[1]cr[0]`).
+"""
+
+import numpy as np
+
+from .branching import mid_circuit_measures, sample_branching
+from .classical import classical_outcome, is_classical
+from .counts import _INT64_CLBITS, Counts
+from .memory import SPARSE_ENTRY_BYTES, memory_limit, plan, simulate_chunked
+from .optimize import optimize as optimize_program
+from .parallel import draw
+from .profiling import NULL
+from .qasm import Program, parse_qasm
+from .sparse import sample_sparse, simulate_auto, simulate_sparse
+from .statevector import probabilities, simulate
+
+# above this many qubits the "auto" engine never switches to a dense state
+MAX_DENSE_QUBITS = 24
+
+
+class SimulatorError(Exception):
+    """Raised when a circuit cannot be run by the local simulator."""
+
+
+def load(qasm, cache=None):
+    """Accept QASM text or an already parsed `Program`.
+
+    With a `CompileCache`, text that was compiled before is not parsed again.
+    """
+    if isinstance(qasm, Program):
+        return qasm
+    if cache is not None:
+        return cache.compile(qasm)
+    return parse_qasm(qasm)
+
+
+def check_trailing_measures(program):
+    """Make sure no gate touches a qubit after it has been measured."""
+    for position, qubit, _ in program.measures:
+        for name, qubits, _ in program.ops[position:]:
+            if qubit in qubits:
+                raise SimulatorError(
+                    "gate %s acts on qubit %d after it was measured; only "
+                    "measurements at the end of the circuit are supported"
+                    % (name, qubit))
+
+
+def clbit_values(program, basis_indices):
+    """Classical register value read out for each computational basis index.
+
+    Values are int64, or Python ints (object arrays) for registers wider
+    than int64 or basis indices that already are Python ints.
+    """
+    basis_indices = np.asarray(basis_indices)
+    if basis_indices.dtype != object:
+        basis_indices = basis_indices.astype(np.int64)
+        if program.num_clbits > _INT64_CLBITS:
+            basis_indices = basis_indices.astype(object)
+    values = np.zeros_like(basis_indices)
+    # a later measurement into the same clbit overwrites the earlier one
+    for _, qubit, clbit in program.measures:
+        values &= ~(1 << clbit)
+        values |= ((basis_indices >> qubit) & 1) << clbit
+    return values
+
+
+def histogram_to_counts(program, basis_hits):
+    """Turn hits per basis index into `Counts` keyed like `get_counts`."""
+    outcomes = np.flatnonzero(basis_hits)
+    values, inverse = np.unique(clbit_values(program, outcomes), return_inverse=True)
+    hits = np.zeros(len(values), dtype=np.uint64)
+    np.add.at(hits, inverse, basis_hits[outcomes])
+    return Counts(values, hits, program.cregs)
+
+
+def run_qasm(qasm, shots=1024, seed=None, cache=None, optimize=True, engine="auto",
+             workers=0, profiler=None, circuit=None):
+    """Simulate a QASM circuit and return its counts.
+
+    Circuits made only of x/cx/ccx are deterministic: their single outcome
+    is computed directly and all `shots` are assigned to it. Other circuits
+    go through `optimize.optimize` first unless `optimize` is False, and run
+    on the engine chosen by `engine`:
+
+    - "dense": the (2,) * n statevector;
+    - "sparse": the {basis state: amplitude} dict, whatever its fill;
+    - "auto": sparse while the state is mostly empty, dense once it fills
+      up (never dense above `MAX_DENSE_QUBITS` qubits);
+    - "chunked": the memory-mapped `memory.ChunkedState`, also used by
+      "dense" when `memory.plan` says the dense state would not fit in
+      `memory.memory_limit()`, and by "auto" when the sparse dict would not.
+
+    Circuits that measure a qubit and then keep using it are run by
+    `branching.sample_branching` (dense, unoptimised, shots split at each
+    such measurement).
+
+    Shots are drawn in-process with `workers=0`; otherwise they are split
+    over that many processes (None: all CPUs) by `parallel.sample_parallel`,
+    which draws the same blocks as the in-process path, so the counts for
+    a seed do not depend on the number of workers.
+
+    With a `profiling.Profiler` the load, optimize, simulate and sample
+    stages are recorded under the name `circuit`.
+    """
+    profiler = profiler or NULL
+    if engine not in ("auto", "dense", "sparse", "chunked"):
+        raise ValueError("unknown engine %r" % engine)
+    with profiler.stage("load", circuit, 0 if isinstance(qasm, Program) else len(qasm)):
+        program = load(qasm, cache)
+    if is_classical(program):
+        with profiler.stage("simulate", circuit):
+            return Counts.single(classical_outcome(program), shots, program.cregs)
+    if mid_circuit_measures(program):
+        if program.num_qubits > MAX_DENSE_QUBITS:
+            raise SimulatorError("mid-circuit measurements need a dense state, "
+                                 "%d qubits is too many" % program.num_qubits)
+        with profiler.stage("simulate", circuit):
+            return sample_branching(program, shots, seed)
+    if engine == "dense":
+        engine = plan(program.num_qubits, "dense")["engine"]
+    # fused dense blocks would only fill the sparse state up, so "auto"
+    # fuses what is left of the circuit when it hands over to dense
+    max_fused_qubits = 2 if optimize else 0
+    if optimize:
+        up_front = max_fused_qubits if engine in ("dense", "chunked") else 0
+        with profiler.stage("optimize", circuit):
+            program = optimize_program(program, max_fused_qubits=up_front)
+    with profiler.stage("simulate", circuit):
+        if engine == "dense":
+            kind, state = "dense", simulate(program)
+        elif engine == "sparse":
+            kind, state = "sparse", simulate_sparse(program)
+        elif engine == "chunked":
+            kind, state = "chunked", simulate_chunked(program)
+        else:
+            kind, state = simulate_auto(program, MAX_DENSE_QUBITS,
+                                        memory_limit() // SPARSE_ENTRY_BYTES, max_fused_qubits)
+    with profiler.stage("sample", circuit):
+        if kind == "chunked":
+            try:
+                return state.sample(program, shots, seed)
+            finally:
+                state.close()
+        if kind == "sparse":
+            return sample_sparse(program, state, shots, seed, workers)
+        probs = probabilities(state, program.num_qubits)
+        basis_hits = draw(probs, shots, seed=seed, workers=workers)
+        return histogram_to_counts(program, basis_hits)
+
+
+def execute(q_program, circuits, shots=1024, seed=None, cache=None, engine="auto",
+            workers=0, profiler=None):
+    """Run circuits of a `QuantumProgram` locally; returns {name: counts}.
+
+    Programs that can hand out compiled circuits (`SpecProgram`) skip the
+    QASM text round trip.
+    """
+    if isinstance(circuits, str):
+        circuits = [circuits]
+    source = getattr(q_program, "get_program", q_program.get_qasm)
+    results = {}
+    for name in circuits:
+        with (profiler or NULL).stage("serialize", name) as stage:
+            qasm = source(name)
+            stage["bytes"] = 0 if isinstance(qasm, Program) else len(qasm)
+        results[name] = run_qasm(qasm, shots=shots, seed=seed, cache=cache,
+                                 engine=engine, workers=workers, profiler=profiler,
+                                 circuit=name)
+    return results
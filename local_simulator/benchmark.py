@@ -0,0 +1,189 @@
+"""Offline benchmark of the tutorial pipeline; run as a script::
+
+    python -m local_simulator.benchmark --output bench.json
+    python -m local_simulator.benchmark --baseline bench.json   # exit 1 on regression
+
+Cases are the tutorial's half-adder circuits (0+0, 1+0, 1+1 and the
+superposed hh) and Cuccaro adders of growing width, once with basis-state
+inputs and once with superposed input bits. For every case the stages
+build, get_qasm, compile (parse), simulate and get_counts are timed; each
+case is repeated and the fastest time of each stage is kept.
+
+The JSON written by `--output` holds {case: {stage: seconds}}. With
+`--baseline`, stages slower than `tolerance` times the baseline and by
+more than `--min-seconds` are reported as regressions; the absolute floor
+keeps millisecond stages, whose times jitter by more than 50%, from
+failing the run.
+
+The time of `import local_simulator` in a fresh interpreter is measured as
+case "import" and must stay within `--import-budget` seconds, without
+pulling in the modules that are meant to load lazily.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from .adder import adder_program
+from .backend import run_qasm
+from .ir import emit_qasm
+from .profiling import Profiler
+from .qasm import parse_qasm
+from .specs import SpecProgram
+
+STAGES = ("build", "get_qasm", "compile", "load", "optimize", "simulate", "sample",
+          "get_counts", "import")
+
+# seconds `import local_simulator` may take in a fresh interpreter
+IMPORT_BUDGET = 0.5
+
+# a stage must slow down by more than this many seconds to be a regression
+MIN_REGRESSION = 5e-3
+
+# modules the core import must not load
+LAZY_MODULES = ("asyncio", "http.server", "concurrent.futures", "local_simulator.remote",
+                "local_simulator.jobs", "local_simulator.noise")
+
+_IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+import local_simulator
+elapsed = time.perf_counter() - start
+print(elapsed, ",".join(m for m in sys.argv[1:] if m in sys.modules))
+"""
+
+TUTORIAL_INPUTS = {"0+0": [], "1+0": ["x qr[0]"], "1+1": ["x qr[0]", "x qr[1]"],
+                   "hh": ["h qr[0]", "h qr[1]"]}
+
+
+def tutorial_specs():
+    """The tutorial's four half-adder circuits as `SpecProgram` specs."""
+    measures = ["measure qr[%d] -> cr[%d]" % (q, 3 - q) for q in range(4)]
+    return {
+        "name": "Program-tutorial",
+        "register_templates": {"half_adder": {
+            "quantum_registers": [{"name": "qr", "size": 4}],
+            "classical_registers": [{"name": "cr", "size": 4}]}},
+        "circuits": [{"name": name, "template": "half_adder",
+                      "gates": inputs + ["half_adder qr"] + measures}
+                     for name, inputs in sorted(TUTORIAL_INPUTS.items())],
+    }
+
+
+def _adder_builders(widths, superposed_bits):
+    builders = {}
+    for n in widths:
+        a, b = (1 << n) - 1, (1 << (n - 1)) | 1
+        builders["adder%d" % n] = lambda n=n, a=a, b=b: adder_program(n, a, b)
+        k = min(n, superposed_bits)
+        builders["adder%d-h%d" % (n, k)] = lambda n=n, k=k: adder_program(
+            n, superpose_a=range(k), superpose_b=range(k))
+    return builders
+
+
+def time_case(build, shots=1024, seed=1234):
+    """Stage times of one pass: build, get_qasm, compile, run, get_counts."""
+    profiler = Profiler()
+    with profiler.stage("build"):
+        program = build()
+    with profiler.stage("get_qasm") as stage:
+        qasm = emit_qasm(program)
+        stage["bytes"] = len(qasm)
+    with profiler.stage("compile"):
+        compiled = parse_qasm(qasm)
+    counts = run_qasm(compiled, shots=shots, seed=seed, profiler=profiler)
+    with profiler.stage("get_counts"):
+        counts.to_dict()
+    return dict((stage, total["wall"]) for stage, total in profiler.summary().items())
+
+
+def run(widths=(1, 2, 4, 8, 16, 32, 64), superposed_bits=4, repeat=5, shots=1024):
+    """{case: {stage: best seconds over `repeat` passes}}."""
+    tutorial = SpecProgram(tutorial_specs())
+    builders = dict((name, lambda name=name: SpecProgram(tutorial_specs()).get_program(name))
+                    for name in tutorial.get_circuit_names())
+    builders.update(_adder_builders(widths, superposed_bits))
+    results = {}
+    for case in sorted(builders):
+        passes = [time_case(builders[case], shots) for _ in range(repeat)]
+        results[case] = dict((stage, min(p.get(stage, 0.0) for p in passes))
+                             for stage in STAGES if any(stage in p for p in passes))
+    return results
+
+
+def import_time(repeat=5):
+    """(best seconds, eagerly loaded lazy modules) of a cold package import."""
+    best, loaded = float("inf"), set()
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, "-c", _IMPORT_PROBE] + list(LAZY_MODULES),
+            universal_newlines=True).split()
+        best = min(best, float(output[0]))
+        loaded.update(output[1].split(",") if len(output) > 1 else ())
+    return best, sorted(loaded)
+
+
+def compare(results, baseline, tolerance=1.5, min_seconds=MIN_REGRESSION):
+    """Regressions as (case, stage, baseline seconds, current seconds)."""
+    regressions = []
+    for case, stages in sorted(results.items()):
+        for stage, seconds in sorted(stages.items()):
+            before = baseline.get(case, {}).get(stage)
+            if before is None:
+                continue
+            if seconds > before * tolerance and seconds - before > min_seconds:
+                regressions.append((case, stage, before, seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument("--min-seconds", type=float, default=MIN_REGRESSION,
+                        help="ignore slowdowns smaller than this")
+    parser.add_argument("--max-bits", type=int, default=64,
+                        help="largest adder width (powers of two up to this)")
+    parser.add_argument("--superposed-bits", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--shots", type=int, default=1024)
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET)
+    args = parser.parse_args(argv)
+
+    widths = [1 << i for i in range(int(np.log2(args.max_bits)) + 1)]
+    results = run(widths, args.superposed_bits, args.repeat, args.shots)
+    seconds, loaded = import_time(args.repeat)
+    results["import"] = {"import": seconds}
+    document = {"python": platform.python_version(), "numpy": np.__version__,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(document, handle, indent=1, sort_keys=True)
+    for case, stages in sorted(results.items()):
+        print("%-14s %s" % (case, "  ".join("%s=%.2fms" % (stage, 1e3 * stages[stage])
+                                            for stage in STAGES if stage in stages)))
+    failed = False
+    if seconds > args.import_budget:
+        print("IMPORT %.0fms exceeds the budget of %.0fms" % (1e3 * seconds, 1e3 * args.import_budget))
+        failed = True
+    if loaded:
+        print("IMPORT loads lazy modules: %s" % ", ".join(loaded))
+        failed = True
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)["results"]
+        regressions = compare(results, baseline, args.tolerance, args.min_seconds)
+        for case, stage, before, now in regressions:
+            print("REGRESSION %s %s: %.2fms -> %.2fms" % (case, stage, 1e3 * before, 1e3 * now))
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
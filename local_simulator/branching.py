@@ -0,0 +1,97 @@
+"""Shots for circuits that measure qubits before the end.
+
+When every measurement is trailing (nothing touches the qubit afterwards)
+the backend computes the final distribution once and draws all shots with
+one multinomial. A measurement followed by more gates on its qubit
+collapses the state, so here the shots are split instead of simulated one
+by one: at such a measurement the shots of each branch are divided
+binomially between the outcomes, the collapsed state of each outcome is
+simulated once for all of its shots, and the trailing measurements at the
+end are again one multinomial per branch. The work grows with the number
+of distinct measurement histories (at most min(shots, 2^k) for k
+mid-circuit measurements), not with the number of shots.
+"""
+
+import numpy as np
+
+from .counts import _INT64_CLBITS, Counts
+from .statevector import apply_gate, zero_state
+
+# below this a measurement outcome is treated as impossible
+EPSILON = 1e-12
+
+
+def mid_circuit_measures(program):
+    """Indices into `program.measures` of the measurements that are not trailing."""
+    last_use = {}
+    for position, (_, qubits, _) in enumerate(program.ops):
+        for qubit in qubits:
+            last_use[qubit] = position
+    return [i for i, (position, qubit, _) in enumerate(program.measures)
+            if last_use.get(qubit, -1) >= position]
+
+
+def _collapse(state, qubit, outcome, probability):
+    axis = state.ndim - 1 - qubit
+    index = [slice(None)] * state.ndim
+    index[axis] = 1 - outcome
+    state = state.copy()
+    state[tuple(index)] = 0
+    return state / np.sqrt(probability)
+
+
+def _one_probability(state, qubit):
+    axis = state.ndim - 1 - qubit
+    return float(np.sum(np.abs(np.take(state, 1, axis=axis)) ** 2))
+
+
+def sample_branching(program, shots, seed=None):
+    """`Counts` for `shots` runs of a program with mid-circuit measurements."""
+    rng = np.random.default_rng(seed)
+    mid = set(mid_circuit_measures(program))
+    # history of outcomes -> (state, register value so far, shots)
+    branches = {(): (zero_state(program.num_qubits), 0, shots)}
+    position = 0
+    trailing = []
+    for i, (at, qubit, clbit) in enumerate(program.measures):
+        if i not in mid:
+            trailing.append((qubit, clbit))
+            continue
+        for name, qubits, params in program.ops[position:at]:
+            branches = dict((h, (apply_gate(s, name, qubits, params), v, n))
+                            for h, (s, v, n) in branches.items())
+        position = at
+        trailing = [(q, c) for q, c in trailing if c != clbit]
+        split = {}
+        for history, (state, value, n) in branches.items():
+            p1 = min(max(_one_probability(state, qubit), 0.0), 1.0)
+            ones = rng.binomial(n, p1)
+            value &= ~(1 << clbit)
+            for outcome, hits, p in ((0, n - ones, 1 - p1), (1, ones, p1)):
+                if hits and p > EPSILON:
+                    split[history + (outcome,)] = (_collapse(state, qubit, outcome, p),
+                                                   value | outcome << clbit, hits)
+        branches = split
+    for name, qubits, params in program.ops[position:]:
+        branches = dict((h, (apply_gate(s, name, qubits, params), v, n))
+                        for h, (s, v, n) in branches.items())
+    if not branches:
+        # shots=0: every branch was dropped at the first measurement
+        return Counts([], [], program.cregs)
+
+    values, hits = [], []
+    dtype = object if program.num_clbits > _INT64_CLBITS else np.int64
+    for state, value, n in branches.values():
+        probs = (np.abs(state) ** 2).reshape(-1)
+        basis_hits = rng.multinomial(n, probs / probs.sum())
+        outcomes = np.flatnonzero(basis_hits)
+        readout = np.full(len(outcomes), value, dtype=dtype)
+        for qubit, clbit in trailing:
+            readout &= ~(1 << clbit)
+            readout |= ((outcomes.astype(dtype) >> qubit) & 1) << clbit
+        values.append(readout)
+        hits.append(basis_hits[outcomes])
+    values, inverse = np.unique(np.concatenate(values), return_inverse=True)
+    total = np.zeros(len(values), dtype=np.uint64)
+    np.add.at(total, inverse, np.concatenate(hits).astype(np.uint64))
+    return Counts(values, total, program.cregs)
@@ -0,0 +1,139 @@
+"""On-disk cache of compiled (parsed) circuits.
+
+Every tutorial cell ends with the same `get_qasm` text being compiled again.
+`CompileCache` stores the compiled circuit (as a compact `CircuitIR`) under
+the SHA-256 of the normalised QASM and the backend name, so an unchanged
+circuit is only compiled once, even across processes::
+
+    cache = local_simulator.CompileCache()
+    local_simulator.run_qasm(Q_program.get_qasm("Circuit"), cache=cache)
+
+Entries are one-circuit `archive` files (arrays and a JSON index, no
+pickle), keyed also by `FORMAT_VERSION` and the opcode table, so entries
+written by another version are never decoded; an entry that cannot be read
+counts as a miss. A hit refreshes the file's mtime, and when the directory
+grows over `max_bytes` the least recently used files are removed.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+
+from .archive import Archive, ArchiveWriter
+from .ir import OPCODES
+from .qasm import parse_qasm
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "local_simulator")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_SUFFIX = ".program"
+
+# bump when the stored layout changes
+FORMAT_VERSION = 2
+
+
+def normalize_qasm(text):
+    """Drop comments and formatting so equivalent QASM hashes the same."""
+    text = "\n".join(line.split("//", 1)[0] for line in text.splitlines())
+    statements = (re.sub(r"\s+", " ", s).strip() for s in text.split(";"))
+    statements = (re.sub(r"\s*([,\[\]()]|->)\s*", r"\1", s) for s in statements)
+    return ";".join(s for s in statements if s) + ";"
+
+
+def cache_key(qasm, backend):
+    digest = hashlib.sha256()
+    digest.update(("%d %s\0" % (FORMAT_VERSION, ",".join(OPCODES))).encode("utf-8"))
+    digest.update(backend.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_qasm(qasm).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CompileCache(object):
+    """Content-addressed, size-capped LRU cache of compiled circuits."""
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        if directory is None:
+            directory = os.environ.get("LOCAL_SIMULATOR_CACHE", DEFAULT_DIRECTORY)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, qasm, backend="local_simulator"):
+        """Compiled `Program` for `qasm`, or None when it is not cached."""
+        key = cache_key(qasm, backend)
+        path = self._path(key)
+        if key in self._memory:
+            self.hits += 1
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+            return self._memory[key]
+        try:
+            program = Archive(path).circuit("circuit")
+            os.utime(path, None)
+        except Exception:
+            # missing, truncated or foreign entries are recompiled
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._memory[key] = program
+        return program
+
+    def put(self, qasm, program, backend="local_simulator"):
+        key = cache_key(qasm, backend)
+        self._memory[key] = program
+        handle, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(handle)
+        with ArchiveWriter(tmp_path) as writer:
+            writer.add_circuit("circuit", program)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def compile(self, qasm, backend="local_simulator"):
+        """Return the cached `Program`, compiling and storing it on a miss."""
+        program = self.get(qasm, backend)
+        if program is None:
+            program = parse_qasm(qasm)
+            self.put(qasm, program, backend)
+        return program
+
+    def evict(self):
+        """Remove least recently used entries until under `max_bytes`."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            key = os.path.basename(path)[:-len(_SUFFIX)]
+            self._memory.pop(key, None)
+
+    def clear(self):
+        self._memory.clear()
+        for name in os.listdir(self.directory):
+            if name.endswith(_SUFFIX):
+                os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,129 @@
+"""Array-backed counts that still look like the dict from `get_counts`.
+
+`Counts` keeps the observed classical register values and their hits in two
+sorted NumPy arrays. Bitstring keys such as '0110' (cr[3]cr[2]cr[1]cr[0])
+are only built when the mapping is iterated or indexed, so wide registers
+and large histograms do not pay for string formatting and dict hashing::
+
+    counts = local_simulator.run_qasm(qasm)
+    counts["1110"]                     # 1024, like the dict from get_counts
+    counts.marginal([0, 1])            # sum bits only: {'10': 1024}
+"""
+
+from collections.abc import Mapping
+
+import numpy as np
+
+# registers up to this width fit in int64; wider ones fall back to Python ints
+_INT64_CLBITS = 62
+
+
+def format_key(cregs, value):
+    """Bitstring key of a register value, last register first like `get_counts`."""
+    words = []
+    for _, offset, size in reversed(cregs):
+        word = (value >> offset) & ((1 << size) - 1)
+        words.append(format(word, "0%db" % size))
+    return " ".join(words)
+
+
+def parse_key(cregs, key):
+    """Inverse of `format_key`; raises KeyError for malformed keys."""
+    words = key.split(" ") if isinstance(key, str) else ()
+    if len(words) != len(cregs):
+        raise KeyError(key)
+    value = 0
+    for word, (_, offset, size) in zip(words, reversed(cregs)):
+        if len(word) != size or word.strip("01"):
+            raise KeyError(key)
+        value |= int(word, 2) << offset
+    return value
+
+
+def _dtype(cregs):
+    width = sum(size for _, _, size in cregs)
+    return np.int64 if width <= _INT64_CLBITS else object
+
+
+class Counts(Mapping):
+    """Read-only {bitstring: hits} mapping stored as (values, hits) arrays.
+
+    `cregs` is the register layout, a list of (name, offset, size) as in
+    `Program.cregs`.
+    """
+
+    def __init__(self, values, hits, cregs):
+        self.cregs = list(cregs)
+        values = np.asarray(values, dtype=_dtype(self.cregs))
+        hits = np.asarray(hits, dtype=np.uint64)
+        keep = hits > 0
+        values, hits = values[keep], hits[keep]
+        order = np.argsort(values, kind="stable")
+        self.values = values[order]
+        self.hits = hits[order]
+
+    @classmethod
+    def from_histogram(cls, histogram, cregs):
+        """Build from a dense histogram indexed by register value."""
+        values = np.flatnonzero(histogram)
+        return cls(values, np.asarray(histogram)[values], cregs)
+
+    @classmethod
+    def single(cls, value, hits, cregs):
+        """All `hits` on one register value (deterministic circuits)."""
+        return cls(np.array([value], dtype=_dtype(cregs)), [hits], cregs)
+
+    @property
+    def num_clbits(self):
+        return sum(size for _, _, size in self.cregs)
+
+    @property
+    def shots(self):
+        return int(self.hits.sum())
+
+    def __getitem__(self, key):
+        value = parse_key(self.cregs, key)
+        position = np.searchsorted(self.values, value)
+        if position < len(self.values) and self.values[position] == value:
+            return int(self.hits[position])
+        raise KeyError(key)
+
+    def __iter__(self):
+        for value in self.values.tolist():
+            yield format_key(self.cregs, value)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return "Counts(%r)" % self.to_dict()
+
+    def to_dict(self):
+        """Plain {bitstring: hits} dict, as returned by `get_counts`."""
+        return dict(zip(self, self.hits.tolist()))
+
+    def int_counts(self):
+        """{register value: hits} without building any strings."""
+        return dict(zip(self.values.tolist(), self.hits.tolist()))
+
+    def histogram(self):
+        """Dense uint64 histogram indexed by register value."""
+        dense = np.zeros(1 << self.num_clbits, dtype=np.uint64)
+        dense[self.values.astype(np.int64)] = self.hits
+        return dense
+
+    def marginal(self, clbits):
+        """Counts over the chosen clbits only; clbits[0] becomes the lowest bit.
+
+        For the adder, `marginal([0, 1])` keeps the sum bits cr[1]cr[0].
+        """
+        clbits = list(clbits)
+        width = len(clbits)
+        layout = [("marginal", 0, width)]
+        values = np.zeros(len(self.values), dtype=_dtype(layout))
+        for position, clbit in enumerate(clbits):
+            values |= ((self.values >> clbit) & 1).astype(values.dtype) << position
+        unique, inverse = np.unique(values, return_inverse=True)
+        hits = np.zeros(len(unique), dtype=np.uint64)
+        np.add.at(hits, inverse, self.hits)
+        return Counts(unique, hits, layout)
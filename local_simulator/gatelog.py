@@ -0,0 +1,272 @@
+"""Append-only gate log: circuits that fork cheaply and share simulated prefixes.
+
+`circuit.x(...)` in the tutorial mutates the one circuit in place, which
+is why the notebook asks to restart the kernel before flipping other
+input bits. A `Circuit` here is a view of the first `length` rows of a
+`GateLog`, a growable set of NumPy arrays in the `CircuitIR` layout with
+measurements as rows of their own. Rows are never changed once written, so::
+
+    base = Circuit([("qr", 4)], [("cr", 4)])
+    qr, cr = base.qreg("qr"), base.creg("cr")
+    one = base.fork().x(qr[0])                  # O(1) fork
+    variants = {"1+0": one.fork(), "1+1": one.fork().x(qr[1])}
+    for circuit in variants.values():
+        circuit.ccx(qr[0], qr[1], qr[2]).cx(qr[0], qr[3]).cx(qr[1], qr[3])
+        circuit.measure(qr, cr)
+
+A fork appending at the end of the log writes in place; a fork whose log
+was extended by someone else first copies its rows into a new log (copy on
+write) that remembers which prefix it shares with the old one.
+
+`PrefixStates` keeps the statevector at fork points, so `run_circuit`
+resumes every variant from the state of its shared prefix instead of
+simulating it again.
+"""
+
+import numpy as np
+
+from .backend import check_trailing_measures, histogram_to_counts
+from .ir import MAX_WIDTH, OPCODE, OPCODES, CircuitIR
+from .parallel import draw
+from .qasm import GATES, Expression, QasmError
+from .statevector import apply_gate, probabilities, zero_state
+
+MEASURE = -1
+
+
+class GateLog(object):
+    """Growable arrays of gate rows; `lineage` lists (log, rows shared with it)."""
+
+    def __init__(self, capacity=16, lineage=()):
+        self.length = 0
+        self.opcodes = np.empty(capacity, dtype=np.int16)
+        self.qubits = np.full((capacity, MAX_WIDTH), -1, dtype=np.int32)
+        self.params = np.full((capacity, MAX_WIDTH), np.nan)
+        self.objects = {}
+        self.lineage = list(lineage)
+        # row counts at which a fork was taken; `PrefixStates` caches these
+        self.checkpoints = set()
+
+    def append(self, opcode, qubits, params=()):
+        if self.length == len(self.opcodes):
+            capacity = 2 * len(self.opcodes)
+            for field in ("opcodes", "qubits", "params"):
+                old = getattr(self, field)
+                new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+                new[:self.length] = old[:self.length]
+                setattr(self, field, new)
+        row = self.length
+        self.opcodes[row] = opcode
+        self.qubits[row] = -1
+        self.params[row] = np.nan
+        if len(qubits) > MAX_WIDTH or any(isinstance(p, Expression) for p in params):
+            self.objects[row] = (tuple(qubits), tuple(params))
+        else:
+            self.qubits[row, :len(qubits)] = qubits
+            self.params[row, :len(params)] = params
+        self.length += 1
+
+    def copy(self, length):
+        """New log holding the first `length` rows of this one."""
+        lineage = [(log, min(rows, length)) for log, rows in self.lineage]
+        log = GateLog(max(16, 2 * length), lineage + [(self, length)])
+        log.opcodes[:length] = self.opcodes[:length]
+        log.qubits[:length] = self.qubits[:length]
+        log.params[:length] = self.params[:length]
+        log.objects = dict((r, o) for r, o in self.objects.items() if r < length)
+        log.length = length
+        return log
+
+    def row(self, index):
+        """(opcode, qubits, params) of one row."""
+        if index in self.objects:
+            qubits, params = self.objects[index]
+            return int(self.opcodes[index]), qubits, params
+        qubits = self.qubits[index]
+        params = self.params[index]
+        return (int(self.opcodes[index]), tuple(qubits[qubits >= 0].tolist()),
+                tuple(params[~np.isnan(params)].tolist()))
+
+
+class Register(object):
+    """Named slice of global qubit / clbit indices; `reg[i]` is an index."""
+
+    def __init__(self, name, offset, size):
+        self.name, self.offset, self.size = name, offset, size
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError("%s[%d] out of range" % (self.name, index))
+        return self.offset + index
+
+    def __len__(self):
+        return self.size
+
+
+def _layout(registers):
+    layout, offset = [], 0
+    for name, size in registers:
+        layout.append((name, offset, size))
+        offset += size
+    return layout
+
+
+class Circuit(object):
+    """The first `length` rows of a `GateLog`; gate methods append and return self."""
+
+    def __init__(self, qregs, cregs):
+        """`qregs` / `cregs` are lists of (name, size), laid out in order."""
+        self.qregs = _layout(qregs)
+        self.cregs = _layout(cregs)
+        self.num_qubits = sum(size for _, _, size in self.qregs)
+        self.num_clbits = sum(size for _, _, size in self.cregs)
+        self._log = GateLog()
+        self._length = 0
+        self._program = None
+
+    def __len__(self):
+        return self._length
+
+    def qreg(self, name):
+        return Register(*[r for r in self.qregs if r[0] == name][0])
+
+    def creg(self, name):
+        return Register(*[r for r in self.cregs if r[0] == name][0])
+
+    def fork(self):
+        """Independent circuit sharing all rows so far (O(1))."""
+        self._log.checkpoints.add(self._length)
+        fork = object.__new__(Circuit)
+        fork.__dict__.update(self.__dict__)
+        return fork
+
+    snapshot = fork
+
+    def append(self, name, qubits, params=()):
+        """Append one row; raises `QasmError` for bad arity or indices."""
+        if name == "measure":
+            qubit, clbit = qubits
+            if not (0 <= qubit < self.num_qubits and 0 <= clbit < self.num_clbits):
+                raise QasmError("measure %d -> %d out of range" % (qubit, clbit))
+        else:
+            if name in GATES and (len(qubits), len(params)) != GATES[name]:
+                raise QasmError("gate %s takes %d parameters and %d qubits" % (
+                    name, GATES[name][1], GATES[name][0]))
+            if any(not 0 <= q < self.num_qubits for q in qubits):
+                raise QasmError("qubit index out of range in %s%r" % (name, tuple(qubits)))
+            if len(set(qubits)) != len(qubits):
+                raise QasmError("repeated qubit in %s%r" % (name, tuple(qubits)))
+        if self._length != self._log.length:
+            # another fork has written past our end: copy our rows first
+            self._log = self._log.copy(self._length)
+        opcode = MEASURE if name == "measure" else OPCODE[name]
+        self._log.append(opcode, qubits, params)
+        self._length += 1
+        self._program = None
+        return self
+
+    def measure(self, qubit, clbit):
+        if isinstance(qubit, Register):
+            for i in range(len(qubit)):
+                self.append("measure", (qubit[i], clbit[i]))
+            return self
+        return self.append("measure", (qubit, clbit))
+
+    def rows(self, start=0):
+        """(name, qubits, params) of the rows from `start`; measures included."""
+        for index in range(start, self._length):
+            opcode, qubits, params = self._log.row(index)
+            yield ("measure" if opcode == MEASURE else OPCODES[opcode]), qubits, params
+
+    def to_program(self):
+        """The circuit as a `Program` (built once per length)."""
+        if self._program is None:
+            opcodes = self._log.opcodes[:self._length]
+            is_gate = opcodes != MEASURE
+            gate_rows = np.flatnonzero(is_gate)
+            measure_rows = np.flatnonzero(~is_gate)
+            positions = np.cumsum(is_gate)[measure_rows] if len(measure_rows) else []
+            measures = np.array([(p, q, c) for p, (q, c) in zip(
+                positions, self._log.qubits[measure_rows, :2].tolist())],
+                dtype=np.int64).reshape(-1, 3)
+            where = dict((int(r), i) for i, r in enumerate(gate_rows))
+            objects = dict((where[r], o) for r, o in self._log.objects.items() if r in where)
+            ir = CircuitIR(self.num_qubits, self.num_clbits, self.qregs, self.cregs,
+                           opcodes[gate_rows], self._log.qubits[gate_rows],
+                           self._log.params[gate_rows], measures, objects)
+            self._program = ir.to_program()
+        return self._program
+
+    def _state_key(self, length):
+        """(log, rows) naming the state after the first `length` rows."""
+        for log, rows in self._log.lineage:
+            if length <= rows:
+                return log, length
+        return self._log, length
+
+
+def _gate_method(name):
+    width, nparams = GATES[name]
+
+    def method(self, *args):
+        if len(args) != nparams + width:
+            raise QasmError("%s takes %d parameters and %d qubits, got %d arguments"
+                            % (name, nparams, width, len(args)))
+        return self.append(name, tuple(args[nparams:]), tuple(args[:nparams]))
+    method.__name__ = name
+    method.__doc__ = "Append %s (parameters first, then %d qubit indices)." % (name, width)
+    return method
+
+
+for _name in OPCODES:
+    if _name in GATES and _name.islower():
+        setattr(Circuit, _name, _gate_method(_name))
+
+
+class PrefixStates(object):
+    """Statevectors at the fork points of gate logs, reused by `run_circuit`."""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._states = {}
+
+    def __len__(self):
+        return len(self._states)
+
+    def lookup(self, circuit, lengths):
+        """(rows, state copy) for the longest cached prefix among `lengths`."""
+        for length in sorted(lengths, reverse=True):
+            log, rows = circuit._state_key(length)
+            entry = self._states.get((id(log), rows))
+            if entry is not None and entry[0] is log:
+                return length, entry[1].copy()
+        return 0, None
+
+    def store(self, circuit, length, state):
+        if len(self._states) >= self.max_entries:
+            self._states.pop(next(iter(self._states)))
+        log, rows = circuit._state_key(length)
+        self._states[(id(log), rows)] = (log, state.copy())
+
+
+def run_circuit(circuit, shots=1024, seed=None, states=None, workers=0):
+    """Counts of a `Circuit`, resuming from the cached state of a shared prefix."""
+    program = circuit.to_program()
+    check_trailing_measures(program)
+    states = PrefixStates() if states is None else states
+    checkpoints = set()
+    for log, rows in circuit._log.lineage:
+        checkpoints |= set(c for c in log.checkpoints if c <= rows)
+    checkpoints |= circuit._log.checkpoints
+    checkpoints = set(c for c in checkpoints if 0 < c < len(circuit))
+    start, state = states.lookup(circuit, checkpoints)
+    if state is None:
+        state = zero_state(circuit.num_qubits)
+    for index, (name, qubits, params) in enumerate(circuit.rows(start), start):
+        if name != "measure":
+            state = apply_gate(state, name, qubits, params)
+        if index + 1 in checkpoints:
+            states.store(circuit, index + 1, state)
+    basis_hits = draw(probabilities(state, program.num_qubits), shots, seed=seed,
+                      workers=workers)
+    return histogram_to_counts(program, basis_hits)
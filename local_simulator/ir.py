@@ -0,0 +1,124 @@
+"""Compact array form of a `Program` and the QASM emitter.
+
+`CircuitIR` stores a circuit as NumPy arrays: one int16 opcode per gate,
+an (m, 3) int32 array of qubit indices (-1 where a gate has fewer qubits)
+and an (m, 3) float64 array of numeric parameters. The few parameters that
+are not plain numbers (symbolic `Expression`s, fused unitaries) are kept in
+a side table. This is what the compile cache stores, and what builders can
+produce directly; QASM text is only generated when `emit_qasm` is called.
+"""
+
+import numpy as np
+
+from .qasm import Expression, Program, QasmError
+
+OPCODES = ("id", "x", "y", "z", "h", "s", "sdg", "t", "tdg",
+           "rx", "ry", "rz", "u1", "u2", "u3", "u",
+           "cx", "cy", "cz", "ch", "swap", "cu1", "ccx", "unitary")
+OPCODE = dict((name, code) for code, name in enumerate(OPCODES))
+
+MAX_WIDTH = 3
+
+
+class CircuitIR(object):
+    """Array-backed circuit; see the module docstring for the layout."""
+
+    def __init__(self, num_qubits, num_clbits, qregs, cregs, opcodes, qubits,
+                 params, measures, objects=None):
+        self.num_qubits = num_qubits
+        self.num_clbits = num_clbits
+        self.qregs = list(qregs)
+        self.cregs = list(cregs)
+        self.opcodes = opcodes
+        self.qubits = qubits
+        self.params = params
+        self.measures = measures
+        self.objects = objects or {}
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    @property
+    def nbytes(self):
+        return (self.opcodes.nbytes + self.qubits.nbytes + self.params.nbytes
+                + self.measures.nbytes)
+
+    @classmethod
+    def from_program(cls, program):
+        m = len(program.ops)
+        opcodes = np.empty(m, dtype=np.int16)
+        qubits = np.full((m, MAX_WIDTH), -1, dtype=np.int32)
+        params = np.full((m, MAX_WIDTH), np.nan)
+        objects = {}
+        for row, (name, op_qubits, op_params) in enumerate(program.ops):
+            opcodes[row] = OPCODE[name]
+            if len(op_qubits) > MAX_WIDTH or name == "unitary":
+                objects[row] = (op_qubits, op_params)
+                continue
+            qubits[row, :len(op_qubits)] = op_qubits
+            if any(isinstance(p, Expression) for p in op_params):
+                objects[row] = (op_qubits, op_params)
+            elif op_params:
+                params[row, :len(op_params)] = op_params
+        measures = np.array(program.measures, dtype=np.int64).reshape(-1, 3)
+        return cls(program.num_qubits, program.num_clbits, program.qregs,
+                   program.cregs, opcodes, qubits, params, measures, objects)
+
+    def to_program(self):
+        program = Program()
+        program.num_qubits, program.num_clbits = self.num_qubits, self.num_clbits
+        program.qregs, program.cregs = list(self.qregs), list(self.cregs)
+        names = [OPCODES[code] for code in self.opcodes.tolist()]
+        widths = (self.qubits >= 0).sum(axis=1).tolist()
+        counts = (~np.isnan(self.params)).sum(axis=1).tolist()
+        qubits = self.qubits.tolist()
+        params = self.params.tolist()
+        objects = self.objects
+        ops = [(name, tuple(q[:w]), tuple(p[:c]))
+               for name, q, w, p, c in zip(names, qubits, widths, params, counts)]
+        for row, (op_qubits, op_params) in objects.items():
+            ops[row] = (names[row], tuple(op_qubits), tuple(op_params))
+        program.ops = ops
+        program.measures = [tuple(m) for m in self.measures.tolist()]
+        return program
+
+
+def _format_param(value):
+    if isinstance(value, Expression):
+        return value.text
+    return repr(float(value))
+
+
+def emit_qasm(circuit):
+    """OpenQASM 2.0 text of a `Program` or `CircuitIR` (one pass over the gates)."""
+    program = circuit.to_program() if isinstance(circuit, CircuitIR) else circuit
+    qubit_names = [None] * program.num_qubits
+    for name, offset, size in program.qregs:
+        for i in range(size):
+            qubit_names[offset + i] = "%s[%d]" % (name, i)
+    clbit_names = [None] * program.num_clbits
+    for name, offset, size in program.cregs:
+        for i in range(size):
+            clbit_names[offset + i] = "%s[%d]" % (name, i)
+
+    lines = ["OPENQASM 2.0;", 'include "qelib1.inc";']
+    lines.extend("qreg %s[%d];" % (name, size) for name, _, size in program.qregs)
+    lines.extend("creg %s[%d];" % (name, size) for name, _, size in program.cregs)
+    measures = program.measures
+    m = 0
+    for position, (name, qubits, params) in enumerate(program.ops):
+        while m < len(measures) and measures[m][0] == position:
+            lines.append("measure %s -> %s;" % (qubit_names[measures[m][1]],
+                                                clbit_names[measures[m][2]]))
+            m += 1
+        if name == "unitary":
+            raise QasmError("fused unitary gates have no QASM form")
+        args = ",".join(qubit_names[q] for q in qubits)
+        if params:
+            values = ",".join(_format_param(p) for p in params)
+            lines.append("%s(%s) %s;" % (name, values, args))
+        else:
+            lines.append("%s %s;" % (name, args))
+    for _, qubit, clbit in measures[m:]:
+        lines.append("measure %s -> %s;" % (qubit_names[qubit], clbit_names[clbit]))
+    return "\n".join(lines) + "\n"
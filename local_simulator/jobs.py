@@ -0,0 +1,120 @@
+"""asyncio front end: several circuits in flight instead of one blocking run.
+
+`Q_program.run(wait=2, timeout=240)` blocks and polls every 2 seconds. Here
+a run is scheduled and an awaitable handle is returned at once, so the five
+tutorial circuits (or any other work) can overlap::
+
+    async def main():
+        jobs = [local_simulator.run_async(qasm) for qasm in sources]
+        return await asyncio.gather(*jobs)
+
+Each run gets a process of its own, which is terminated when the run times
+out or its task is cancelled, so an abandoned simulation does not keep
+burning CPU (or hold up `asyncio.run` at exit).
+
+`poll` is the waiting half for jobs that live somewhere else (e.g. a job id
+returned by the remote API): it starts with a short interval, backs off
+geometrically up to `max_interval` and gives up after `timeout`.
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import time
+
+from .backend import SimulatorError, run_qasm
+from .profiling import NULL
+
+
+def _run_child(connection, qasm, shots, seed, cache):
+    try:
+        result = ("counts", run_qasm(qasm, shots=shots, seed=seed, cache=cache))
+    except Exception as error:
+        result = ("error", error)
+    connection.send(result)
+    connection.close()
+
+
+async def _run_in_process(qasm, shots, seed, cache, timeout):
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_run_child, daemon=True,
+                                      args=(sender, qasm, shots, seed, cache))
+    process.start()
+    sender.close()
+    loop = asyncio.get_event_loop()
+    try:
+        # a terminated child closes the pipe, which ends the poll early
+        if not await loop.run_in_executor(None, receiver.poll, timeout):
+            raise asyncio.TimeoutError("simulation not finished after %s seconds" % timeout)
+        try:
+            kind, value = receiver.recv()
+        except EOFError:
+            process.join()
+            raise SimulatorError("simulation process exited with code %s" % process.exitcode)
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+    if kind == "error":
+        raise value
+    return value
+
+
+def run_async(qasm, shots=1024, seed=None, cache=None, timeout=240, executor=None):
+    """Schedule a local run and return an `asyncio.Task` resolving to counts.
+
+    Must be called from a coroutine. By default the simulation runs in a
+    process of its own; if it is not finished after `timeout` seconds, or
+    the task is cancelled, the process is terminated and the task raises
+    `asyncio.TimeoutError` (or `CancelledError`). With an `executor` the
+    run goes there instead; the timeout still applies, but a thread cannot
+    be stopped, so the simulation then runs to completion in the background.
+    """
+    if executor is None:
+        return asyncio.ensure_future(_run_in_process(qasm, shots, seed, cache, timeout))
+    loop = asyncio.get_event_loop()
+    work = loop.run_in_executor(executor, functools.partial(
+        run_qasm, qasm, shots=shots, seed=seed, cache=cache))
+    return asyncio.ensure_future(asyncio.wait_for(work, timeout))
+
+
+async def execute_async(q_program, circuits, shots=1024, seed=None, cache=None,
+                        timeout=240, executor=None):
+    """Run circuits of a `QuantumProgram` concurrently; returns {name: counts}.
+
+    Like `execute`, programs that hand out compiled circuits skip the QASM text.
+    """
+    if isinstance(circuits, str):
+        circuits = [circuits]
+    source = getattr(q_program, "get_program", q_program.get_qasm)
+    jobs = [run_async(source(name), shots=shots, seed=seed,
+                      cache=cache, timeout=timeout, executor=executor)
+            for name in circuits]
+    return dict(zip(circuits, await asyncio.gather(*jobs)))
+
+
+async def poll(fetch, is_done, timeout=240, interval=0.05, max_interval=5.0,
+               factor=1.5, executor=None, profiler=None, circuit=None):
+    """Call `fetch()` until `is_done(status)`, backing off between calls.
+
+    `fetch` is a blocking callable (run in `executor`) or a coroutine
+    function. Returns the last status; raises `asyncio.TimeoutError` when
+    `timeout` seconds pass without completion. The wait and the number of
+    `fetch` calls are recorded as stage "poll" when `profiler` is given.
+    """
+    loop = asyncio.get_event_loop()
+    deadline = time.monotonic() + timeout
+    with (profiler or NULL).stage("poll", circuit) as stage:
+        while True:
+            stage["iterations"] += 1
+            if asyncio.iscoroutinefunction(fetch):
+                status = await fetch()
+            else:
+                status = await loop.run_in_executor(executor, fetch)
+            if is_done(status):
+                return status
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError("job not finished after %s seconds" % timeout)
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * factor, max_interval)
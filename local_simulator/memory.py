@@ -0,0 +1,214 @@
+"""Memory planning and an out-of-core statevector for wide registers.
+
+`"size"` in `Q_SPECS` can be anything, but a dense state of n qubits takes
+16 * 2^n bytes (and the gate kernels need about as much again for their
+result), so around 30 qubits a dense run exhausts memory. `plan` estimates
+the memory of a circuit for an engine before anything is allocated;
+`plan_specs` does it from the declared registers of every circuit in a
+specs dict.
+
+When the dense state would not fit in `memory_limit()` the backend uses a
+`ChunkedState` instead: the 2^n amplitudes live in a memory-mapped file and
+are processed in chunks of 2^chunk_qubits, with `chunk_qubits` chosen so
+that the gathered chunks fit in the limit. A gate on low qubits only is
+applied to each chunk on its own; a gate that involves high qubits gathers
+the 2, 4 or 8 chunks it mixes. Large registers then become disk-bound runs
+instead of a crash.
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from .counts import Counts
+from .statevector import apply_gate
+
+# largest chunk of a `ChunkedState` (2^20 amplitudes = 16 MiB of complex128);
+# `plan` picks smaller chunks when the memory limit is lower
+CHUNK_QUBITS = 20
+
+# smallest chunk worth the per-chunk overhead
+MIN_CHUNK_QUBITS = 10
+
+# rough size of one {int: complex} entry of the sparse engine
+SPARSE_ENTRY_BYTES = 200
+
+
+def memory_limit():
+    """Bytes a run may use: $LOCAL_SIMULATOR_MEMORY_LIMIT, else half the RAM."""
+    limit = os.environ.get("LOCAL_SIMULATOR_MEMORY_LIMIT")
+    if limit:
+        return int(float(limit))
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 2
+    except (AttributeError, ValueError, OSError):
+        return 4 << 30
+
+
+def estimate_bytes(num_qubits, engine="dense", chunk_qubits=CHUNK_QUBITS):
+    """Peak bytes of the state for `engine` ("dense", "density" or "chunked")."""
+    if engine == "dense":
+        # the state plus the result array of a gate on the whole state
+        return 2 * 16 << num_qubits
+    if engine == "density":
+        return 2 * 16 << 2 * num_qubits
+    if engine == "chunked":
+        # up to 8 gathered chunks (ccx with three high qubits) and their result
+        return 2 * 8 * 16 << min(num_qubits, chunk_qubits)
+    raise ValueError("unknown engine %r" % engine)
+
+
+def chunk_qubits_for(limit):
+    """Largest chunk size (up to `CHUNK_QUBITS`) whose chunked run fits in `limit`."""
+    chunk_qubits = CHUNK_QUBITS
+    while chunk_qubits > MIN_CHUNK_QUBITS and estimate_bytes(
+            chunk_qubits, "chunked", chunk_qubits) > limit:
+        chunk_qubits -= 1
+    return chunk_qubits
+
+
+def plan(num_qubits, engine="dense", limit=None, chunk_qubits=None):
+    """{"engine", "bytes", "disk_bytes", "limit", "chunk_qubits"}: dense if it
+    fits, else chunked with chunks sized for `limit` (unless `chunk_qubits`)."""
+    limit = memory_limit() if limit is None else limit
+    if chunk_qubits is None:
+        chunk_qubits = chunk_qubits_for(limit)
+    chunk_qubits = min(chunk_qubits, num_qubits)
+    needed = estimate_bytes(num_qubits, engine, chunk_qubits)
+    if engine == "dense" and needed > limit:
+        engine, needed = "chunked", estimate_bytes(num_qubits, "chunked", chunk_qubits)
+    return {"engine": engine, "bytes": needed,
+            "disk_bytes": 16 << num_qubits if engine == "chunked" else 0,
+            "limit": limit, "chunk_qubits": chunk_qubits if engine == "chunked" else None}
+
+
+def check_plan(report, directory=None):
+    """Raise `SimulatorError` if a `plan` does not fit in memory or on disk."""
+    from .backend import SimulatorError  # backend imports this module
+    problems = []
+    if report["bytes"] > report["limit"]:
+        problems.append("%d bytes exceed the memory limit" % report["bytes"])
+    if report["disk_bytes"]:
+        free = shutil.disk_usage(directory or tempfile.gettempdir()).free
+        if report["disk_bytes"] > free:
+            problems.append("%d bytes on disk exceed the %d free" % (report["disk_bytes"], free))
+    if problems:
+        raise SimulatorError("%s: %r" % ("; ".join(problems), report))
+
+
+def plan_specs(specs, engine="dense", limit=None):
+    """`plan` for every circuit of a `QuantumProgram` specs dict, by name."""
+    templates = specs.get("register_templates", {})
+    plans = {}
+    for circuit in specs.get("circuits", []):
+        registers = list(circuit.get("quantum_registers", []))
+        registers += templates.get(circuit.get("template"), {}).get("quantum_registers", [])
+        plans[circuit["name"]] = plan(sum(r["size"] for r in registers), engine, limit)
+    return plans
+
+
+class ChunkedState(object):
+    """Statevector of `num_qubits` qubits in a memory-mapped file.
+
+    Flat index i is the basis state with bit q = qubit q, as for the dense
+    engine; chunk c holds indices [c << chunk_qubits, (c + 1) << chunk_qubits).
+    `chunk_qubits` defaults to the size `plan` picks for the memory limit.
+    The file is created in `directory` (the temp dir by default) and
+    removed by `close`. `SimulatorError` is raised up front when the
+    chunks or the file would not fit (see `check_plan`).
+    """
+
+    def __init__(self, num_qubits, directory=None, chunk_qubits=None):
+        self.amplitudes = None
+        report = plan(num_qubits, "chunked", chunk_qubits=chunk_qubits)
+        check_plan(report, directory)
+        self.num_qubits = num_qubits
+        self.chunk_qubits = report["chunk_qubits"]
+        self.num_chunks = 1 << (num_qubits - self.chunk_qubits)
+        handle, self.path = tempfile.mkstemp(suffix=".state", dir=directory)
+        os.close(handle)
+        try:
+            # a new memmap file is all zeros (and sparse on disk until written)
+            self.amplitudes = np.memmap(self.path, dtype=complex, mode="w+",
+                                        shape=(self.num_chunks, 1 << self.chunk_qubits))
+        except BaseException:
+            os.remove(self.path)
+            raise
+        self.amplitudes[0, 0] = 1
+
+    @classmethod
+    def from_sparse(cls, state, num_qubits, directory=None, chunk_qubits=None):
+        chunked = cls(num_qubits, directory, chunk_qubits)
+        chunked.amplitudes[0, 0] = 0
+        flat = chunked.amplitudes.reshape(-1)
+        for key, amplitude in state.items():
+            flat[key] = amplitude
+        return chunked
+
+    def close(self):
+        if self.amplitudes is not None:
+            del self.amplitudes
+            self.amplitudes = None
+            os.remove(self.path)
+
+    def __del__(self):
+        self.close()
+
+    def apply_gate(self, name, qubits, params=()):
+        k = self.chunk_qubits
+        high = sorted(set(q - k for q in qubits if q >= k))
+        if not high:
+            local = (2,) * k
+            for c in range(self.num_chunks):
+                chunk = np.array(self.amplitudes[c]).reshape(local)
+                self.amplitudes[c] = apply_gate(chunk, name, qubits, params).reshape(-1)
+            return self
+        # local qubit k + j is high chunk bit high[j]
+        mapping = dict((k + h, k + j) for j, h in enumerate(high))
+        local_qubits = tuple(mapping.get(q, q) for q in qubits)
+        mask = sum(1 << h for h in high)
+        offsets = [sum(((m >> j) & 1) << h for j, h in enumerate(high))
+                   for m in range(1 << len(high))]
+        shape = (2,) * (k + len(high))
+        for base in range(self.num_chunks):
+            if base & mask:
+                continue
+            rows = [base | offset for offset in offsets]
+            group = np.array(self.amplitudes[rows]).reshape(shape)
+            group = apply_gate(group, name, local_qubits, params)
+            self.amplitudes[rows] = group.reshape(len(rows), -1)
+        return self
+
+    def chunk_probabilities(self):
+        """Total probability of each chunk."""
+        return np.array([np.sum(np.abs(self.amplitudes[c]) ** 2)
+                         for c in range(self.num_chunks)])
+
+    def sample(self, program, shots, seed=None):
+        """`Counts` of `shots` draws: first over chunks, then within each chunk."""
+        rng = np.random.default_rng(seed)
+        masses = self.chunk_probabilities()
+        per_chunk = rng.multinomial(shots, masses / masses.sum())
+        counts = {}
+        for c in np.flatnonzero(per_chunk):
+            probs = np.abs(np.asarray(self.amplitudes[c])) ** 2
+            hits = rng.multinomial(per_chunk[c], probs / probs.sum())
+            for index in np.flatnonzero(hits).tolist():
+                key = int(c) << self.chunk_qubits | index
+                value = 0
+                for _, qubit, clbit in program.measures:
+                    value = value & ~(1 << clbit) | (key >> qubit & 1) << clbit
+                counts[value] = counts.get(value, 0) + int(hits[index])
+        return Counts(np.array(list(counts), dtype=object), list(counts.values()),
+                      program.cregs)
+
+
+def simulate_chunked(program, state=None, directory=None, chunk_qubits=None):
+    """Run `program` on a `ChunkedState` (|0...0> by default)."""
+    if state is None:
+        state = ChunkedState(program.num_qubits, directory, chunk_qubits)
+    for name, qubits, params in program.ops:
+        state.apply_gate(name, qubits, params)
+    return state
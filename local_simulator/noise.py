@@ -0,0 +1,231 @@
+"""Noisy simulation: what a real device would roughly return instead of 100% '0000'.
+
+A `NoiseModel` adds, after every gate and on each qubit it touches, a
+depolarizing channel (rho -> (1 - p) rho + p I/2) and amplitude damping
+(|1> decays to |0> with probability gamma), and flips measured bits with
+the readout error probabilities. Two engines compute the outcome
+distribution:
+
+- "density": the exact density matrix, an array of shape (2,) * 2n whose
+  last n axes are the ket and first n the bra qubits (so the statevector
+  gate kernels apply to it). 4^n entries: fine for the 4-qubit adder,
+  practical up to `MAX_DENSITY_QUBITS`.
+- "trajectories": Monte-Carlo statevector runs, each picking one Kraus
+  branch per channel; the outcome distribution is their average. Runs are
+  spread over `workers` processes, with one seed per trajectory so the
+  result does not depend on the number of workers.
+
+Readout errors are applied exactly to the outcome distribution, then all
+shots are drawn with one multinomial::
+
+    noise = NoiseModel(depolarizing=0.01, amplitude_damping=0.02, readout=0.03)
+    register_device("ibmqx_noisy", noise)
+    execute_noisy(Q_program, ["Circuit"], "ibmqx_noisy")["Circuit"]
+
+Noise is per gate, so circuits are not optimised (fusing gates would change
+how much noise they get). Only trailing measurements are supported.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .backend import check_trailing_measures, clbit_values, load
+from .counts import Counts
+from .statevector import (CONTROLLED, PERMUTATIONS, apply_gate, apply_matrix,
+                          apply_unitary, gate_matrix, zero_state)
+
+# above this many qubits the "auto" engine uses trajectories
+MAX_DENSITY_QUBITS = 10
+
+_PAULIS = (np.array([[0, 1], [1, 0]], dtype=complex),
+           np.array([[0, -1j], [1j, 0]], dtype=complex),
+           np.array([[1, 0], [0, -1]], dtype=complex))
+
+# noise models by device name, for `execute_noisy`
+DEVICES = {}
+
+
+class NoiseModel(object):
+    """Gate and readout error rates.
+
+    `depolarizing` and `amplitude_damping` are a probability for every gate
+    or a {gate name: probability} dict. `readout` is the probability of
+    reading a bit wrong, or a pair (P(0 read as 1), P(1 read as 0)).
+    """
+
+    def __init__(self, depolarizing=0.0, amplitude_damping=0.0, readout=0.0):
+        self.depolarizing = depolarizing
+        self.amplitude_damping = amplitude_damping
+        if np.ndim(readout) == 0:
+            readout = (readout, readout)
+        self.readout = tuple(float(r) for r in readout)
+
+    @staticmethod
+    def _rate(rates, name):
+        return rates.get(name, 0.0) if isinstance(rates, dict) else rates
+
+    def channels(self, name):
+        """(depolarizing p, damping gamma) applied after gate `name`."""
+        return self._rate(self.depolarizing, name), self._rate(self.amplitude_damping, name)
+
+    def __repr__(self):
+        return "NoiseModel(depolarizing=%r, amplitude_damping=%r, readout=%r)" % (
+            self.depolarizing, self.amplitude_damping, self.readout)
+
+
+def register_device(name, noise):
+    """Make `noise` available as `execute_noisy(..., name)`."""
+    DEVICES[name] = noise
+
+
+def _kraus(p, gamma):
+    """Kraus operators of depolarizing(p) followed by damping(gamma)."""
+    operators = [np.eye(2, dtype=complex)]
+    if p:
+        operators = [np.sqrt(1 - 0.75 * p) * np.eye(2, dtype=complex)]
+        operators += [np.sqrt(p / 4) * pauli for pauli in _PAULIS]
+    if gamma:
+        damping = [np.array([[1, 0], [0, np.sqrt(1 - gamma)]], dtype=complex),
+                   np.array([[0, np.sqrt(gamma)], [0, 0]], dtype=complex)]
+        operators = [d @ k for d in damping for k in operators]
+    return operators
+
+
+def _apply_bra(rho, name, qubits, params, n):
+    """Multiply the bra side of `rho` by the conjugate gate."""
+    shifted = tuple(q + n for q in qubits)
+    if name == "unitary":
+        return apply_unitary(rho, np.conj(params[0]), shifted)
+    if name in PERMUTATIONS or name in ("swap", "id"):
+        return apply_gate(rho, name, shifted, params)
+    if name in CONTROLLED:
+        num_controls, base = CONTROLLED[name]
+        controls, target = shifted[:num_controls], shifted[num_controls]
+    else:
+        base, controls, target = name, (), shifted[0]
+    return apply_matrix(rho, gate_matrix(base, params).conj(), target, controls)
+
+
+def _apply_channel(rho, operators, qubit, n):
+    if len(operators) == 1:
+        return rho
+    total = np.zeros_like(rho)
+    for k in operators:
+        term = apply_matrix(rho.copy(), k, qubit)
+        total += apply_matrix(term, k.conj(), qubit + n)
+    return total
+
+
+def density_probabilities(program, noise):
+    """Exact basis-state probabilities of the noisy circuit (density matrix)."""
+    n = program.num_qubits
+    rho = zero_state(2 * n)
+    for name, qubits, params in program.ops:
+        rho = apply_gate(rho, name, qubits, params)
+        rho = _apply_bra(rho, name, qubits, params, n)
+        operators = _kraus(*noise.channels(name))
+        for qubit in qubits:
+            rho = _apply_channel(rho, operators, qubit, n)
+    return np.real(np.diagonal(rho.reshape(1 << n, 1 << n))).copy()
+
+
+def _trajectory(program, noise, rng):
+    state = zero_state(program.num_qubits)
+    for name, qubits, params in program.ops:
+        state = apply_gate(state, name, qubits, params)
+        p, gamma = noise.channels(name)
+        for qubit in qubits:
+            if p and rng.random() < 0.75 * p:
+                state = apply_matrix(state, _PAULIS[rng.integers(3)], qubit)
+            if gamma:
+                axis = state.ndim - 1 - qubit
+                excited = np.sum(np.abs(np.take(state, 1, axis=axis)) ** 2)
+                if rng.random() < gamma * excited:
+                    jump = np.array([[0, 1], [0, 0]], dtype=complex)
+                    state = apply_matrix(state, jump, qubit) / np.sqrt(excited)
+                else:
+                    keep = np.array([[1, 0], [0, np.sqrt(1 - gamma)]], dtype=complex)
+                    state = apply_matrix(state, keep, qubit)
+                    state /= np.sqrt(1 - gamma * excited)
+    return (np.abs(state) ** 2).reshape(-1)
+
+
+def _run_trajectories(program, noise, seeds):
+    total = np.zeros(1 << program.num_qubits)
+    for seed in seeds:
+        total += _trajectory(program, noise, np.random.default_rng(seed))
+    return total
+
+
+def trajectory_probabilities(program, noise, trajectories=256, seed=None, workers=0):
+    """Basis-state probabilities averaged over `trajectories` noisy runs.
+
+    With `workers` other than 0 the runs are split over that many
+    processes (None: all CPUs).
+    """
+    seeds = np.random.SeedSequence(seed).spawn(trajectories)
+    if workers == 0:
+        return _run_trajectories(program, noise, seeds) / trajectories
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        chunks = [seeds[i::workers] for i in range(workers)]
+        parts = pool.map(_run_trajectories, [program] * workers, [noise] * workers, chunks)
+        return sum(parts) / trajectories
+
+
+def apply_readout(distribution, readout, clbits, num_clbits):
+    """Distribution over register values after independent bit-flip errors on `clbits`."""
+    p01, p10 = readout
+    if not (p01 or p10):
+        return distribution
+    confusion = np.array([[1 - p01, p10], [p01, 1 - p10]])
+    tensor = distribution.reshape((2,) * num_clbits)
+    for clbit in clbits:
+        axis = num_clbits - 1 - clbit
+        tensor = np.moveaxis(np.tensordot(confusion, tensor, axes=([1], [axis])), 0, axis)
+    return tensor.reshape(-1)
+
+
+def noisy_distribution(program, noise, engine="auto", trajectories=256, seed=None,
+                       workers=0):
+    """Probability of every classical register value under `noise`."""
+    check_trailing_measures(program)
+    if engine == "auto":
+        engine = "density" if program.num_qubits <= MAX_DENSITY_QUBITS else "trajectories"
+    if engine == "density":
+        basis = density_probabilities(program, noise)
+    elif engine == "trajectories":
+        basis = trajectory_probabilities(program, noise, trajectories, seed, workers)
+    else:
+        raise ValueError("unknown engine %r" % engine)
+    values = clbit_values(program, np.arange(len(basis)))
+    distribution = np.bincount(values, weights=basis, minlength=1 << program.num_clbits)
+    measured = sorted(set(clbit for _, _, clbit in program.measures))
+    return apply_readout(distribution, noise.readout, measured, program.num_clbits)
+
+
+def run_noisy(qasm, noise, shots=1024, seed=None, cache=None, engine="auto",
+              trajectories=256, workers=0):
+    """Counts of a QASM circuit (or `Program`) run with `noise`, like `run_qasm`."""
+    if isinstance(noise, str):
+        noise = DEVICES[noise]
+    program = load(qasm, cache)
+    rng = np.random.default_rng(seed)
+    distribution = noisy_distribution(program, noise, engine, trajectories,
+                                      rng.integers(1 << 63), workers)
+    distribution = np.clip(distribution, 0, None)
+    hits = rng.multinomial(shots, distribution / distribution.sum())
+    return Counts.from_histogram(hits, program.cregs)
+
+
+def execute_noisy(q_program, circuits, noise, shots=1024, seed=None, cache=None,
+                  engine="auto", trajectories=256, workers=0):
+    """`execute` with a `NoiseModel` or the name of a registered noisy device."""
+    if isinstance(circuits, str):
+        circuits = [circuits]
+    source = getattr(q_program, "get_program", q_program.get_qasm)
+    return dict((name, run_noisy(source(name), noise, shots=shots, seed=seed, cache=cache,
+                                 engine=engine, trajectories=trajectories, workers=workers))
+                for name in circuits)
@@ -0,0 +1,156 @@
+"""Circuit optimisation applied before simulation.
+
+Every gate is one sweep over the statevector, so the pass tries to leave
+fewer of them:
+
+1. adjacent self-inverse pairs on the same qubits (x.x, h.h, cx.cx, ...)
+   cancel;
+2. runs of consecutive gates whose qubits together fit in
+   `max_fused_qubits` are multiplied into one dense ("unitary") gate;
+3. measurements of qubits that no later gate touches are moved to the end.
+
+A measurement in the middle of the circuit acts as a barrier on its qubit,
+so nothing is cancelled or fused across it. The result is a new `Program`;
+`optimize` remembers it per input program.
+"""
+
+import weakref
+
+import numpy as np
+
+from .qasm import Program
+from .statevector import PERMUTATIONS, apply_gate
+
+SELF_INVERSE = frozenset(["id", "x", "y", "z", "h", "cx", "cy", "cz", "ch", "ccx", "swap"])
+
+_OPTIMIZED = weakref.WeakKeyDictionary()
+
+
+def _same_gate(a, b):
+    if a[0] != b[0] or a[2] != b[2]:
+        return False
+    if a[0] == "swap" or a[0] == "cz":
+        return set(a[1]) == set(b[1])
+    if a[0] == "ccx":
+        return set(a[1][:2]) == set(b[1][:2]) and a[1][2] == b[1][2]
+    return a[1] == b[1]
+
+
+def _sequence(program):
+    """Gates and measurements interleaved in program order."""
+    items = []
+    measures = iter(program.measures)
+    pending = next(measures, None)
+    for position, op in enumerate(program.ops):
+        while pending is not None and pending[0] == position:
+            items.append(("measure", (pending[1],), pending[2]))
+            pending = next(measures, None)
+        items.append(op)
+    while pending is not None:
+        items.append(("measure", (pending[1],), pending[2]))
+        pending = next(measures, None)
+    return items
+
+
+def cancel_pairs(items):
+    """Drop adjacent pairs of identical self-inverse gates."""
+    kept = []
+    last = {}  # qubit -> stack of indices into `kept` touching that qubit
+    for item in items:
+        name, qubits, _ = item
+        if name in SELF_INVERSE:
+            tops = set(last[q][-1] if last.get(q) else None for q in qubits)
+            if len(tops) == 1:
+                top = tops.pop()
+                if top is not None and kept[top] is not None and _same_gate(kept[top], item):
+                    kept[top] = None
+                    for q in qubits:
+                        last[q].pop()
+                    continue
+        if name == "id":
+            continue
+        kept.append(item)
+        for q in qubits:
+            last.setdefault(q, []).append(len(kept) - 1)
+    return [item for item in kept if item is not None]
+
+
+def block_unitary(ops, qubits):
+    """Dense matrix of `ops` on `qubits`; bit i of the index is qubits[i]."""
+    local = dict((q, i) for i, q in enumerate(qubits))
+    size = 1 << len(qubits)
+    # row j of the batch starts as basis vector j and ends as column j of U
+    state = np.eye(size, dtype=complex).reshape((size,) + (2,) * len(qubits))
+    for name, op_qubits, params in ops:
+        state = apply_gate(state, name, tuple(local[q] for q in op_qubits), params)
+    return state.reshape(size, size).T.copy()
+
+
+def fuse_blocks(items, max_fused_qubits=2):
+    """Merge runs of consecutive gates acting on at most `max_fused_qubits`."""
+    fused = []
+    block, block_qubits = [], []
+
+    def flush():
+        if len(block) == 1 or (block and all(op[0] in PERMUTATIONS for op in block)):
+            fused.extend(block)
+        elif block:
+            qubits = tuple(sorted(block_qubits))
+            fused.append(("unitary", qubits, (block_unitary(block, qubits),)))
+        del block[:], block_qubits[:]
+
+    for item in items:
+        name, qubits, _ = item
+        if name == "measure":
+            if qubits[0] in block_qubits:
+                flush()
+            fused.append(item)
+            continue
+        union = set(block_qubits) | set(qubits)
+        if len(union) > max_fused_qubits:
+            flush()
+            union = set(qubits)
+        block.append(item)
+        block_qubits[:] = sorted(union)
+    flush()
+    return fused
+
+
+def _rebuild(program, items):
+    result = Program()
+    result.num_qubits, result.num_clbits = program.num_qubits, program.num_clbits
+    result.qregs, result.cregs = list(program.qregs), list(program.cregs)
+    # a measurement can move to the end when no later gate touches its qubit
+    # and no measurement that has to stay in place writes its clbit later
+    final = [False] * len(items)
+    touched, blocked = set(), set()
+    for i in range(len(items) - 1, -1, -1):
+        name, qubits, arg = items[i]
+        if name != "measure":
+            touched.update(qubits)
+        elif qubits[0] in touched or arg in blocked:
+            blocked.add(arg)
+        else:
+            final[i] = True
+    tail = []
+    for item, is_final in zip(items, final):
+        name, qubits, arg = item
+        if name != "measure":
+            result.ops.append(item)
+        elif is_final:
+            tail.append((qubits[0], arg))
+        else:
+            result.measures.append((len(result.ops), qubits[0], arg))
+    result.measures.extend((len(result.ops), q, c) for q, c in tail)
+    return result
+
+
+def optimize(program, max_fused_qubits=2):
+    """Optimised copy of `program` (cached per program and setting)."""
+    cached = _OPTIMIZED.setdefault(program, {})
+    if max_fused_qubits not in cached:
+        items = cancel_pairs(_sequence(program))
+        if max_fused_qubits > 0:
+            items = fuse_blocks(items, max_fused_qubits)
+        cached[max_fused_qubits] = _rebuild(program, items)
+    return cached[max_fused_qubits]
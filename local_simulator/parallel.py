@@ -0,0 +1,92 @@
+"""Shot sampling spread over several processes.
+
+Drawing 10^8 shots from a wide outcome distribution is the slow part of a
+run, so `sample_parallel` cuts the shots into fixed blocks of `block_shots`
+and lets a `ProcessPoolExecutor` draw them. Each block gets its own RNG
+stream spawned from one `SeedSequence` (a single block uses the seed
+itself), and blocks do not depend on which worker draws them, so the
+merged histogram for a given seed is the same with 0, 1 or 64 workers.
+The probabilities are put into shared memory once instead of being
+pickled for every worker.
+"""
+
+import os
+
+import numpy as np
+
+BLOCK_SHOTS = 1 << 22
+
+
+def _blocks(shots, seed, block_shots):
+    sizes = [block_shots] * (shots // block_shots)
+    if shots % block_shots:
+        sizes.append(shots % block_shots)
+    # one block draws exactly like `default_rng(seed).multinomial(shots, ...)`
+    seeds = [seed] if len(sizes) == 1 else np.random.SeedSequence(seed).spawn(len(sizes))
+    return list(zip(seeds, sizes))
+
+
+def _draw_blocks(probs, blocks):
+    hits = np.zeros(len(probs), dtype=np.int64)
+    for block_seed, size in blocks:
+        hits += np.random.default_rng(block_seed).multinomial(size, probs)
+    return hits
+
+
+def _worker(shm_name, length, blocks):
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        probs = np.ndarray((length,), dtype=np.float64, buffer=shm.buf)
+        hits = _draw_blocks(probs, blocks)
+        del probs
+    finally:
+        shm.close()
+    support = np.flatnonzero(hits)
+    return support, hits[support]
+
+
+def sample_parallel(probs, shots, seed=None, workers=None, block_shots=BLOCK_SHOTS):
+    """Hits per outcome for `shots` draws from `probs`, using `workers` processes.
+
+    `workers=None` uses every CPU. The result only depends on `seed` and
+    `block_shots`, not on the number of workers.
+    """
+    probs = np.asarray(probs, dtype=np.float64)
+    probs = probs / probs.sum()
+    blocks = _blocks(shots, seed, block_shots)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(blocks)))
+    if workers == 1:
+        return _draw_blocks(probs, blocks)
+
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(create=True, size=max(probs.nbytes, 1))
+    try:
+        shared = np.ndarray(probs.shape, dtype=np.float64, buffer=shm.buf)
+        shared[:] = probs
+        hits = np.zeros(len(probs), dtype=np.int64)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            jobs = [pool.submit(_worker, shm.name, len(probs), blocks[i::workers])
+                    for i in range(workers)]
+            for job in jobs:
+                support, part = job.result()
+                hits[support] += part
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+    return hits
+
+
+def draw(probs, shots, seed=None, workers=0):
+    """Sample `shots` outcomes: in-process when `workers` is 0, otherwise
+    through `sample_parallel`; both draw the same blocks."""
+    if workers == 0:
+        probs = np.asarray(probs, dtype=np.float64)
+        return _draw_blocks(probs / probs.sum(), _blocks(shots, seed, BLOCK_SHOTS))
+    return sample_parallel(probs, shots, seed=seed, workers=workers)
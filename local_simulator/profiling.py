@@ -0,0 +1,90 @@
+"""Per-stage timing of the program lifecycle.
+
+A `Profiler` records one entry per stage and circuit: wall time, CPU time
+of this process, bytes serialised and polling iterations. `run_qasm`,
+`execute` and `poll` take a `profiler` argument and record their stages
+(serialize, load, optimize, simulate, sample, poll); the remote calls of
+the tutorial can be timed with `call`::
+
+    profiler = Profiler()
+    profiler.call("compile", Q_program.compile, circuits, device)
+    profiler.call("run", Q_program.run, wait=2, timeout=240)
+    local_simulator.execute(Q_program, circuits, profiler=profiler)
+    profiler.summary()   # {"run": {"wall": ..., "cpu": ..., "calls": 1, ...}, ...}
+
+A large "run" wall time with little CPU time is network and queue wait;
+CPU time in "load"/"simulate" is local overhead. Callbacks added with
+`add_hook` get every entry as it is recorded, e.g. to export it to a
+metrics system.
+"""
+
+import contextlib
+import time
+
+FIELDS = ("wall", "cpu", "bytes", "iterations")
+
+
+class Profiler(object):
+    """Collects stage entries; see the module docstring."""
+
+    def __init__(self, hooks=()):
+        self.entries = []
+        self._hooks = list(hooks)
+
+    def add_hook(self, hook):
+        """Call `hook(entry)` for every entry recorded from now on."""
+        self._hooks.append(hook)
+
+    def record(self, stage, circuit=None, wall=0.0, cpu=0.0, bytes=0, iterations=0):
+        entry = {"stage": stage, "circuit": circuit, "wall": wall, "cpu": cpu,
+                 "bytes": bytes, "iterations": iterations}
+        self.entries.append(entry)
+        for hook in self._hooks:
+            hook(entry)
+        return entry
+
+    @contextlib.contextmanager
+    def stage(self, stage, circuit=None, bytes=0):
+        """Time the `with` block; the yielded dict can update bytes/iterations."""
+        extra = {"bytes": bytes, "iterations": 0}
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield extra
+        finally:
+            self.record(stage, circuit, time.perf_counter() - wall,
+                        time.process_time() - cpu, extra["bytes"], extra["iterations"])
+
+    def call(self, stage, func, *args, **kwargs):
+        """Run `func(*args, **kwargs)` as stage `stage` and return its result."""
+        with self.stage(stage, kwargs.pop("circuit", None)):
+            return func(*args, **kwargs)
+
+    def report(self):
+        """All entries, in the order they were recorded."""
+        return [dict(entry) for entry in self.entries]
+
+    def summary(self, by_circuit=False):
+        """Totals per stage (or per (stage, circuit)) with a call count."""
+        totals = {}
+        for entry in self.entries:
+            key = (entry["stage"], entry["circuit"]) if by_circuit else entry["stage"]
+            total = totals.setdefault(key, dict.fromkeys(FIELDS, 0))
+            total.setdefault("calls", 0)
+            total["calls"] += 1
+            for field in FIELDS:
+                total[field] += entry[field]
+        return totals
+
+    def clear(self):
+        del self.entries[:]
+
+
+class _NullProfiler(object):
+    """Stand-in used when no profiler is given; records nothing."""
+
+    @contextlib.contextmanager
+    def stage(self, stage, circuit=None, bytes=0):
+        yield {"bytes": bytes, "iterations": 0}
+
+
+NULL = _NullProfiler()
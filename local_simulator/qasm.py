@@ -0,0 +1,272 @@
+"""Minimal OpenQASM 2.0 reader for the circuits built in the tutorial.
+
+`Q_program.get_qasm("Circuit")` returns text such as::
+
+    OPENQASM 2.0;
+    include "qelib1.inc";
+    qreg qr[4];
+    creg cr[4];
+    x qr[0];
+    ccx qr[0],qr[1],qr[2];
+    measure qr[0] -> cr[3];
+
+`parse_qasm` turns it into a `Program`: every register is flattened onto
+global qubit / clbit indices (first declared register first) so the
+simulator never has to look at register names again.
+"""
+
+import ast
+import math
+import operator
+import re
+
+import numpy as np
+
+
+class QasmError(Exception):
+    """Raised when the QASM text uses something this reader does not know."""
+
+
+class Program(object):
+    """Flattened circuit.
+
+    - num_qubits / num_clbits : total width of all qreg / creg
+    - qregs / cregs : list of (name, offset, size) in declaration order
+    - ops : list of (name, qubits, params) for unitary gates
+    - measures : list of (position, qubit, clbit); `position` is the number
+      of gates in `ops` that come before the measurement
+    """
+
+    def __init__(self):
+        self.num_qubits = 0
+        self.num_clbits = 0
+        self.qregs = []
+        self.cregs = []
+        self.ops = []
+        self.measures = []
+
+    def __repr__(self):
+        return "Program(qubits=%d, clbits=%d, gates=%d, measures=%d)" % (
+            self.num_qubits, self.num_clbits, len(self.ops), len(self.measures))
+
+
+# number of qubits and parameters of every gate the simulator can apply
+GATES = {
+    "id": (1, 0), "x": (1, 0), "y": (1, 0), "z": (1, 0), "h": (1, 0),
+    "s": (1, 0), "sdg": (1, 0), "t": (1, 0), "tdg": (1, 0),
+    "rx": (1, 1), "ry": (1, 1), "rz": (1, 1),
+    "u1": (1, 1), "u2": (1, 2), "u3": (1, 3), "U": (1, 3),
+    "cx": (2, 0), "CX": (2, 0), "cy": (2, 0), "cz": (2, 0),
+    "ch": (2, 0), "swap": (2, 0), "cu1": (2, 1),
+    "ccx": (3, 0),
+}
+
+_BINOPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub,
+    ast.Mult: operator.mul, ast.Div: operator.truediv, ast.Pow: operator.pow,
+}
+# NumPy versions so that symbolic parameters can be bound to whole arrays
+_FUNCS = {"sin": np.sin, "cos": np.cos, "tan": np.tan,
+          "exp": np.exp, "ln": np.log, "sqrt": np.sqrt}
+
+# one statement per match: name, optional (params), arguments up to ';'.
+# The params group runs to the last ')' before the arguments (which never
+# contain parentheses), so nested calls like `rz(sin(pi/2))` stay whole.
+# Anything else (e.g. text without a closing ';') lands in the last group.
+_STATEMENT = re.compile(
+    r"\s*(?:([A-Za-z_]\w*)\s*(?:\(([^;]*)\))?\s*([^;()]*);|(\S+))")
+_ARGUMENT = re.compile(r"^(\w+)\s*(?:\[\s*(\d+)\s*\])?$")
+_DECLARATION = re.compile(r"^(\w+)\s*\[\s*(\d+)\s*\]$")
+
+
+class Expression(object):
+    """Gate parameter that refers to symbolic parameters, e.g. `theta/2`.
+
+    `evaluate` binds the names to numbers or to NumPy arrays (one value per
+    point of a parameter sweep).
+    """
+
+    def __init__(self, text, tree, names):
+        self.text = text
+        self.tree = tree
+        self.names = frozenset(names)
+
+    def evaluate(self, bindings):
+        return _evaluate(self.tree, bindings)
+
+    def __repr__(self):
+        return "Expression(%r)" % self.text
+
+
+def _evaluate(node, bindings):
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body, bindings)
+    if isinstance(node, ast.Constant):
+        return float(node.value)
+    if isinstance(node, ast.Name):
+        return math.pi if node.id == "pi" else bindings[node.id]
+    if isinstance(node, ast.UnaryOp):
+        value = _evaluate(node.operand, bindings)
+        return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.BinOp):
+        return _BINOPS[type(node.op)](_evaluate(node.left, bindings),
+                                      _evaluate(node.right, bindings))
+    return _FUNCS[node.func.id](_evaluate(node.args[0], bindings))
+
+
+def _check(node, text, parameters, names):
+    """Reject anything but arithmetic on numbers, pi and declared parameters."""
+    if isinstance(node, ast.Expression):
+        return _check(node.body, text, parameters, names)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return
+    if isinstance(node, ast.Name) and (node.id == "pi" or node.id in parameters):
+        if node.id != "pi":
+            names.add(node.id)
+        return
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        return _check(node.operand, text, parameters, names)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINOPS:
+        _check(node.left, text, parameters, names)
+        return _check(node.right, text, parameters, names)
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id in _FUNCS and len(node.args) == 1 and not node.keywords):
+        return _check(node.args[0], text, parameters, names)
+    raise QasmError("unsupported parameter expression: %r" % text)
+
+
+def eval_param(text, parameters=()):
+    """Evaluate a gate parameter such as `pi/2` or `-0.5*pi`.
+
+    Expressions using names from `parameters` are kept as `Expression`.
+    """
+    try:
+        tree = ast.parse(text.replace("^", "**").strip(), mode="eval")
+    except SyntaxError:
+        raise QasmError("unsupported parameter expression: %r" % text)
+    names = set()
+    _check(tree, text, parameters, names)
+    if names:
+        return Expression(text.strip(), tree, names)
+    return float(_evaluate(tree, {}))
+
+
+def _split_params(text):
+    """Split a parameter list at the commas outside parentheses."""
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth < 0:
+                raise QasmError("unbalanced parentheses in %r" % text)
+        elif char == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    if depth:
+        raise QasmError("unbalanced parentheses in %r" % text)
+    parts.append(text[start:])
+    return parts
+
+
+def _strip_comments(text):
+    return "\n".join(line.split("//", 1)[0] for line in text.splitlines())
+
+
+def parse_qasm(text, parameters=()):
+    """Parse OpenQASM 2.0 text into a `Program`.
+
+    Names listed in `parameters` may appear in gate parameters, e.g.
+    `rz(theta) q[0];`; such parameters are kept as `Expression` objects to
+    be bound later (see `sweep.run_sweep`).
+
+    Parameters can nest parentheses and function calls:
+
+    >>> parse_qasm("qreg q[1]; rz(sin(pi/2)) q[0]; u3(-(pi/2),0,(pi)) q[0];").ops
+    [('rz', (0,), (1.0,)), ('u3', (0,), (-1.5707963267948966, 0.0, 3.141592653589793))]
+    """
+    program = Program()
+    qregs = {}
+    cregs = {}
+    # generated circuits repeat the same arguments and angles many times
+    resolved = {}
+    evaluated = {}
+
+    def resolve(arg, registers):
+        key = (arg, registers is qregs)
+        if key in resolved:
+            return resolved[key]
+        match = _ARGUMENT.match(arg.strip())
+        if not match or match.group(1) not in registers:
+            raise QasmError("unknown register argument: %r" % arg)
+        offset, size = registers[match.group(1)]
+        if match.group(2) is None:
+            result = [offset + i for i in range(size)]
+        else:
+            index = int(match.group(2))
+            if index >= size:
+                raise QasmError("index out of range: %r" % arg)
+            result = [offset + index]
+        resolved[key] = result
+        return result
+
+    def evaluate(param):
+        if param not in evaluated:
+            evaluated[param] = eval_param(param, parameters)
+        return evaluated[param]
+
+    for match in _STATEMENT.finditer(_strip_comments(text)):
+        name, params, args, garbage = match.groups()
+        statement = match.group(0).strip()
+        if garbage is not None:
+            raise QasmError("cannot parse statement: %r" % garbage)
+        if name == "OPENQASM" or name == "include":
+            continue
+        if name in ("qreg", "creg"):
+            decl = _DECLARATION.match(args.strip())
+            if not decl:
+                raise QasmError("bad register declaration: %r" % statement)
+            reg_name, size = decl.group(1), int(decl.group(2))
+            if name == "qreg":
+                qregs[reg_name] = (program.num_qubits, size)
+                program.qregs.append((reg_name, program.num_qubits, size))
+                program.num_qubits += size
+            else:
+                cregs[reg_name] = (program.num_clbits, size)
+                program.cregs.append((reg_name, program.num_clbits, size))
+                program.num_clbits += size
+        elif name == "barrier":
+            continue
+        elif name == "measure":
+            source, _, target = args.partition("->")
+            qubits = resolve(source, qregs)
+            clbits = resolve(target, cregs)
+            if len(qubits) != len(clbits):
+                raise QasmError("register size mismatch: %r" % statement)
+            for qubit, clbit in zip(qubits, clbits):
+                program.measures.append((len(program.ops), qubit, clbit))
+        elif name in GATES:
+            width, num_params = GATES[name]
+            values = tuple(evaluate(p) for p in _split_params(params)) if params else ()
+            if len(values) != num_params:
+                raise QasmError("gate %s takes %d parameters" % (name, num_params))
+            operands = [resolve(a, qregs) for a in args.split(",")]
+            if len(operands) != width:
+                raise QasmError("gate %s acts on %d qubits" % (name, width))
+            # a whole-register argument broadcasts the gate over the register
+            length = max(len(o) for o in operands)
+            if length == 1:
+                qubits = tuple(o[0] for o in operands)
+                if width > 1 and len(set(qubits)) != width:
+                    raise QasmError("repeated qubit in %r" % statement)
+                program.ops.append((name.lower(), qubits, values))
+                continue
+            for i in range(length):
+                qubits = tuple(o[i] if len(o) > 1 else o[0] for o in operands)
+                if len(set(qubits)) != len(qubits):
+                    raise QasmError("repeated qubit in %r" % statement)
+                program.ops.append((name.lower(), qubits, values))
+        else:
+            raise QasmError("unsupported statement: %r" % statement)
+    return program
@@ -0,0 +1,291 @@
+"""Pooled session for the Quantum Experience REST API, plus a local stand-in.
+
+`Q_program.set_api(...)` logs in again in every notebook cell, and every
+`run()` submits one job and polls it on its own. `ApiSession` keeps one
+logged-in session per (token, url), reuses keep-alive HTTP connections,
+submits many QASM circuits in a single Jobs request and polls several jobs
+with one request per round::
+
+    session = ApiSession.get(Qconfig.APItoken, Qconfig.config["url"])
+    job = session.submit([Q_program.get_qasm(n) for n in circuits], device="simulator")
+    counts = session.wait([job["id"]], timeout=240)[job["id"]]   # one dict per circuit
+
+`wait` blocks; from a running event loop (a Jupyter notebook) use
+`await session.wait_async(...)`.
+
+The endpoints used are those of the v1 API: POST /users/loginWithToken,
+POST /Jobs and GET /Jobs (with a loopback `inq` filter). `LocalApiServer`
+serves the same endpoints from the local simulator and counts requests
+and connections, so the savings can be checked offline::
+
+    with LocalApiServer() as server:
+        session = ApiSession("token", server.url)
+        ...
+        server.requests, server.connections
+"""
+
+import http.client
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+from .backend import run_qasm
+from .jobs import poll
+from .profiling import NULL
+
+# logged-in sessions by (token, url); the access token is reused until it expires
+_SESSIONS = {}
+
+# methods that may be sent again when the connection fails after sending
+IDEMPOTENT = frozenset(["GET", "HEAD", "PUT", "DELETE", "OPTIONS"])
+
+
+class ApiError(Exception):
+    """Raised for a failed request to the remote API."""
+
+
+class ApiSession(object):
+    """Logged-in API client with a pool of keep-alive connections."""
+
+    def __init__(self, token, url, pool_size=4, ttl=3600, timeout=60):
+        parts = urlsplit(url)
+        self.token = token
+        self.url = url
+        self.ttl = ttl
+        self._host, self._https = parts.netloc, parts.scheme == "https"
+        self._prefix = parts.path.rstrip("/")
+        self._timeout = timeout
+        self._pool = []
+        self._pool_size = pool_size
+        self._lock = threading.Lock()
+        self._access_token = None
+        self._expires = 0.0
+
+    @classmethod
+    def get(cls, token, url, **kwargs):
+        """Shared session for (token, url), created on first use."""
+        key = (token, url)
+        if key not in _SESSIONS:
+            _SESSIONS[key] = cls(token, url, **kwargs)
+        return _SESSIONS[key]
+
+    def _connection(self):
+        with self._lock:
+            if self._pool:
+                return self._pool.pop()
+        factory = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+        return factory(self._host, timeout=self._timeout)
+
+    def _release(self, connection):
+        with self._lock:
+            if len(self._pool) < self._pool_size:
+                self._pool.append(connection)
+                return
+        connection.close()
+
+    def request(self, method, path, body=None, params=None, authorized=True):
+        """Send one request on a pooled connection and return the decoded JSON."""
+        params = dict(params or {})
+        if authorized:
+            params["access_token"] = self.access_token()
+        query = "&".join("%s=%s" % (k, quote(str(v), safe="")) for k, v in sorted(params.items()))
+        target = self._prefix + path + ("?" + query if query else "")
+        payload = None if body is None else json.dumps(body).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        for attempt in (0, 1):
+            connection = self._connection()
+            sent = False
+            try:
+                connection.request(method, target, payload, headers)
+                sent = True
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # the server closed an idle keep-alive connection: retry on a new
+                # one, unless it may have acted on a request that is not idempotent
+                # (a second POST /Jobs would submit the job twice)
+                connection.close()
+                if attempt or (sent and method not in IDEMPOTENT):
+                    raise
+                continue
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(connection)
+            break
+        if response.status >= 400:
+            raise ApiError("%s %s: %d %s" % (method, path, response.status, data[:200]))
+        return json.loads(data.decode("utf-8")) if data else None
+
+    def access_token(self):
+        """Cached access token; logs in again only after `ttl` seconds."""
+        if self._access_token is None or time.monotonic() >= self._expires:
+            reply = self.request("POST", "/users/loginWithToken",
+                                 {"apiToken": self.token}, authorized=False)
+            self._access_token = reply["id"]
+            self._expires = time.monotonic() + min(self.ttl, reply.get("ttl", self.ttl))
+        return self._access_token
+
+    def submit(self, qasms, device="simulator", shots=1024, max_credits=3, seed=None):
+        """Submit all `qasms` as one job; returns the job description."""
+        body = {"qasms": [{"qasm": qasm} for qasm in qasms], "shots": shots,
+                "maxCredits": max_credits, "backend": {"name": device}}
+        if seed is not None:
+            body["seed"] = seed
+        return self.request("POST", "/Jobs", body)
+
+    def statuses(self, job_ids):
+        """{job id: job} for several jobs, fetched with one request."""
+        where = json.dumps({"where": {"id": {"inq": list(job_ids)}}})
+        return dict((job["id"], job) for job in self.request("GET", "/Jobs", params={"filter": where}))
+
+    def wait(self, job_ids, timeout=240, interval=0.05, max_interval=5.0, factor=1.5,
+             profiler=None):
+        """Poll the jobs together until all are done; {job id: [counts per qasm]}.
+
+        Raises `TimeoutError` after `timeout` seconds. Blocks the calling
+        thread; inside a running event loop (e.g. a Jupyter notebook) use
+        `await session.wait_async(...)` instead.
+        """
+        job_ids = list(job_ids)
+        deadline = time.monotonic() + timeout
+        with (profiler or NULL).stage("poll") as stage:
+            while True:
+                stage["iterations"] += 1
+                jobs = self.statuses(job_ids)
+                if _finished(jobs, job_ids):
+                    return _results(jobs, job_ids)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("jobs not finished after %s seconds" % timeout)
+                time.sleep(min(interval, remaining))
+                interval = min(interval * factor, max_interval)
+
+    async def wait_async(self, job_ids, timeout=240, interval=0.05, max_interval=5.0,
+                         profiler=None):
+        """`wait` as a coroutine, polling with `jobs.poll`."""
+        job_ids = list(job_ids)
+        jobs = await poll(lambda: self.statuses(job_ids),
+                          lambda jobs: _finished(jobs, job_ids), timeout=timeout,
+                          interval=interval, max_interval=max_interval, profiler=profiler)
+        return _results(jobs, job_ids)
+
+    def close(self):
+        with self._lock:
+            for connection in self._pool:
+                connection.close()
+            del self._pool[:]
+
+
+def _finished(jobs, job_ids):
+    return all(jobs.get(i, {}).get("status") in ("COMPLETED", "ERROR_RUNNING_JOB")
+               for i in job_ids)
+
+
+def _results(jobs, job_ids):
+    results = {}
+    for job_id in job_ids:
+        if jobs[job_id]["status"] != "COMPLETED":
+            raise ApiError("job %s failed: %s %s" % (job_id, jobs[job_id]["status"],
+                                                     jobs[job_id].get("error", "")))
+        results[job_id] = [q["result"]["data"]["counts"] for q in jobs[job_id]["qasms"]]
+    return results
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.count("connections")
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self, method):
+        self.server.count("requests")
+        parts = urlsplit(self.path)
+        query = dict((k, v[0]) for k, v in parse_qs(parts.query).items())
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length).decode("utf-8")) if length else None
+        server = self.server
+        if method == "POST" and parts.path == "/users/loginWithToken":
+            server.count("logins")
+            return self._reply(200, {"id": "access-%d" % server.logins, "ttl": 1209600})
+        if query.get("access_token") is None:
+            return self._reply(401, {"error": "missing access token"})
+        if method == "POST" and parts.path == "/Jobs":
+            return self._reply(200, server.submit(body))
+        if method == "GET" and parts.path == "/Jobs":
+            ids = json.loads(query["filter"])["where"]["id"]["inq"]
+            return self._reply(200, [server.jobs[i] for i in ids if i in server.jobs])
+        return self._reply(404, {"error": "no route for %s %s" % (method, parts.path)})
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+
+class LocalApiServer(ThreadingHTTPServer):
+    """In-process stand-in for the API, running jobs on the local simulator.
+
+    Jobs complete after `delay` seconds. `requests`, `connections` and
+    `logins` count what clients did.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, delay=0.0):
+        ThreadingHTTPServer.__init__(self, ("127.0.0.1", port), _Handler)
+        self.url = "http://127.0.0.1:%d" % self.server_address[1]
+        self.delay = delay
+        self.jobs = {}
+        self.requests = self.connections = self.logins = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def submit(self, body):
+        with self._lock:
+            job_id = "job-%d" % len(self.jobs)
+            job = {"id": job_id, "status": "RUNNING",
+                   "qasms": [{"qasm": q["qasm"]} for q in body["qasms"]]}
+            self.jobs[job_id] = job
+
+        def finish():
+            try:
+                for entry in job["qasms"]:
+                    counts = run_qasm(entry["qasm"], shots=body["shots"], seed=body.get("seed"))
+                    entry["result"] = {"data": {"counts": counts.to_dict()}}
+            except Exception as error:
+                job["error"] = "%s: %s" % (type(error).__name__, error)
+                job["status"] = "ERROR_RUNNING_JOB"
+            else:
+                job["status"] = "COMPLETED"
+
+        threading.Timer(self.delay, finish).start()
+        return {"id": job_id, "status": "RUNNING"}
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,270 @@
+"""Layout and routing onto a device coupling map, before submission.
+
+`Q_program.compile(circuits, device)` decides somewhere remote how the
+virtual `qr` is placed on the physical qubits. `route` does it locally
+so the cost can be seen first:
+
+1. gates are decomposed into cx and single-qubit gates (the half adder's
+   ccx becomes 6 cx, 2 h and 7 t/tdg, as in qelib1.inc);
+2. candidate layouts (virtual -> physical qubit) are scored by the number
+   of SWAPs routing needs, and the best one is kept;
+3. the circuit is routed: a cx between qubits that are not coupled is
+   preceded by SWAPs along a shortest path, and a cx against the direction
+   of the coupling map is turned around with four h gates.
+
+A coupling map is {control: [targets]} like the IBM devices'
+`coupling_map`; `COUPLING_MAPS` has a few. The chosen layout is cached by
+a hash of the circuit structure (gate names and qubits, not parameter
+values), so sweeps and repeated compiles skip the search::
+
+    routed, report = route(program, "ibmqx4")
+    report["swaps"], report["cx"], report["depth"]
+"""
+
+import hashlib
+import itertools
+from collections import deque
+
+from .optimize import _sequence
+from .qasm import Expression, Program, QasmError
+
+COUPLING_MAPS = {
+    # 5-qubit "bowtie" devices of the Quantum Experience
+    "ibmqx2": {0: [1, 2], 1: [2], 3: [2, 4], 4: [2]},
+    "ibmqx4": {1: [0], 2: [0, 1, 4], 3: [2, 4]},
+}
+
+# largest number of physical qubits for which every layout is scored
+EXHAUSTIVE_QUBITS = 6
+
+_LAYOUTS = {}
+_MAX_LAYOUTS = 1024
+
+
+def linear_map(num_qubits):
+    """Coupling map of a line 0 - 1 - ... - n-1, coupled both ways."""
+    edges = {}
+    for q in range(num_qubits - 1):
+        edges.setdefault(q, []).append(q + 1)
+        edges.setdefault(q + 1, []).append(q)
+    return edges
+
+
+def _half(param):
+    if isinstance(param, Expression):
+        raise QasmError("cannot decompose cu1 with a symbolic angle")
+    return param / 2
+
+
+def decompose(name, qubits, params):
+    """cx + single-qubit gates equivalent to one gate (qelib1.inc definitions)."""
+    if name == "ccx":
+        a, b, c = qubits
+        return [("h", (c,), ()), ("cx", (b, c), ()), ("tdg", (c,), ()),
+                ("cx", (a, c), ()), ("t", (c,), ()), ("cx", (b, c), ()),
+                ("tdg", (c,), ()), ("cx", (a, c), ()), ("t", (b,), ()),
+                ("t", (c,), ()), ("h", (c,), ()), ("cx", (a, b), ()),
+                ("t", (a,), ()), ("tdg", (b,), ()), ("cx", (a, b), ())]
+    if name == "swap":
+        a, b = qubits
+        return [("cx", (a, b), ()), ("cx", (b, a), ()), ("cx", (a, b), ())]
+    if name == "cz":
+        a, b = qubits
+        return [("h", (b,), ()), ("cx", (a, b), ()), ("h", (b,), ())]
+    if name == "cy":
+        a, b = qubits
+        return [("sdg", (b,), ()), ("cx", (a, b), ()), ("s", (b,), ())]
+    if name == "ch":
+        a, b = qubits
+        return [("h", (b,), ()), ("sdg", (b,), ()), ("cx", (a, b), ()), ("h", (b,), ()),
+                ("t", (b,), ()), ("cx", (a, b), ()), ("t", (b,), ()), ("h", (b,), ()),
+                ("s", (b,), ()), ("x", (b,), ()), ("s", (a,), ())]
+    if name == "cu1":
+        a, b = qubits
+        half = _half(params[0])
+        return [("u1", (a,), (half,)), ("cx", (a, b), ()), ("u1", (b,), (-half,)),
+                ("cx", (a, b), ()), ("u1", (b,), (half,))]
+    if name == "unitary":
+        raise QasmError("fused unitary gates cannot be routed; route before optimising")
+    return [(name, qubits, params)]
+
+
+def _edges(coupling_map):
+    directed = set()
+    for control, targets in coupling_map.items():
+        for target in targets:
+            directed.add((int(control), int(target)))
+    neighbours = {}
+    for a, b in directed:
+        neighbours.setdefault(a, set()).add(b)
+        neighbours.setdefault(b, set()).add(a)
+    return directed, neighbours
+
+
+def _distances(neighbours):
+    distance = {}
+    for start in neighbours:
+        seen = {start: 0}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            for other in neighbours[node]:
+                if other not in seen:
+                    seen[other] = seen[node] + 1
+                    queue.append(other)
+        distance[start] = seen
+    return distance
+
+
+def _path(neighbours, start, goal):
+    previous = {start: None}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        if node == goal:
+            break
+        for other in sorted(neighbours[node]):
+            if other not in previous:
+                previous[other] = node
+                queue.append(other)
+    path = [goal]
+    while path[-1] != start:
+        path.append(previous[path[-1]])
+    return path[::-1]
+
+
+def _route_items(items, layout, directed, neighbours):
+    """Physical items and SWAP count for `items` placed by `layout`."""
+    position = dict(layout)
+    routed, swaps = [], 0
+
+    def cx(a, b):
+        if (a, b) in directed:
+            routed.append(("cx", (a, b), ()))
+        else:
+            routed.extend([("h", (a,), ()), ("h", (b,), ()), ("cx", (b, a), ()),
+                           ("h", (a,), ()), ("h", (b,), ())])
+
+    for name, qubits, arg in items:
+        if name == "measure":
+            routed.append((name, (position[qubits[0]],), arg))
+            continue
+        if name != "cx":
+            routed.append((name, tuple(position[q] for q in qubits), arg))
+            continue
+        a, b = position[qubits[0]], position[qubits[1]]
+        if b not in neighbours.get(a, ()):
+            path = _path(neighbours, a, b)
+            occupant = dict((p, v) for v, p in position.items())
+            # walk the control along the path until it sits next to the target
+            for here, there in zip(path[:-2], path[1:-1]):
+                cx(here, there), cx(there, here), cx(here, there)
+                swaps += 1
+                va, vb = occupant.get(here), occupant.get(there)
+                occupant[here], occupant[there] = vb, va
+                if va is not None:
+                    position[va] = there
+                if vb is not None:
+                    position[vb] = here
+            a = position[qubits[0]]
+        cx(a, b)
+    return routed, swaps
+
+
+def _candidates(num_virtual, items, neighbours):
+    physical = sorted(neighbours)
+    if len(physical) <= EXHAUSTIVE_QUBITS:
+        for chosen in itertools.permutations(physical, num_virtual):
+            yield dict(enumerate(chosen))
+        return
+    yield dict((v, physical[v]) for v in range(num_virtual))
+    weight = {}
+    for name, qubits, _ in items:
+        if name == "cx":
+            for q in qubits:
+                weight[q] = weight.get(q, 0) + 1
+    order = sorted(range(num_virtual), key=lambda q: -weight.get(q, 0))
+    # greedy: the busiest virtual qubits on a breadth-first ball around each start
+    for start in physical:
+        ball, queue, seen = [], deque([start]), {start}
+        while queue and len(ball) < num_virtual:
+            node = queue.popleft()
+            ball.append(node)
+            for other in sorted(neighbours[node]):
+                if other not in seen:
+                    seen.add(other)
+                    queue.append(other)
+        if len(ball) == num_virtual:
+            yield dict(zip(order, ball))
+
+
+def structure_hash(program, coupling_map):
+    """Hash of gate names and qubits (not parameter values) and the map."""
+    digest = hashlib.sha256()
+    digest.update(repr(sorted((int(c), sorted(t)) for c, t in coupling_map.items())).encode())
+    digest.update(repr((program.num_qubits, program.measures)).encode())
+    for name, qubits, _ in program.ops:
+        digest.update(("%s%r" % (name, qubits)).encode())
+    return digest.hexdigest()
+
+
+def depth(program):
+    """Number of gate layers (measurements included)."""
+    level = [0] * program.num_qubits
+    for name, qubits, _ in _sequence(program):
+        top = max(level[q] for q in qubits) + 1
+        for q in qubits:
+            level[q] = top
+    return max(level) if level else 0
+
+
+def route(program, coupling_map, cache=True):
+    """(routed `Program` on the physical qubits, report dict).
+
+    `coupling_map` is a {control: [targets]} dict or a name in
+    `COUPLING_MAPS`. The report holds the layout (virtual -> physical),
+    the number of SWAPs, gate and cx counts and depth after routing, and
+    whether the layout came from the cache.
+    """
+    if isinstance(coupling_map, str):
+        coupling_map = COUPLING_MAPS[coupling_map]
+    directed, neighbours = _edges(coupling_map)
+    num_physical = max(neighbours) + 1
+    if program.num_qubits > len(neighbours):
+        raise QasmError("%d qubits do not fit on a %d-qubit coupling map"
+                        % (program.num_qubits, len(neighbours)))
+    items = []
+    for item in _sequence(program):
+        items.extend([item] if item[0] == "measure" else decompose(*item))
+
+    key = structure_hash(program, coupling_map)
+    cached = cache and key in _LAYOUTS
+    if cached:
+        layout = _LAYOUTS[key]
+        routed, swaps = _route_items(items, layout, directed, neighbours)
+    else:
+        best = None
+        for layout in _candidates(program.num_qubits, items, neighbours):
+            routed, swaps = _route_items(items, layout, directed, neighbours)
+            if best is None or swaps < best[2]:
+                best = (layout, routed, swaps)
+            if swaps == 0:
+                break
+        layout, routed, swaps = best
+        if cache:
+            if len(_LAYOUTS) >= _MAX_LAYOUTS:
+                _LAYOUTS.pop(next(iter(_LAYOUTS)))
+            _LAYOUTS[key] = layout
+
+    result = Program()
+    result.num_qubits, result.num_clbits = num_physical, program.num_clbits
+    result.qregs, result.cregs = [("q", 0, num_physical)], list(program.cregs)
+    for name, qubits, arg in routed:
+        if name == "measure":
+            result.measures.append((len(result.ops), qubits[0], arg))
+        else:
+            result.ops.append((name, qubits, arg))
+    report = {"layout": dict(layout), "swaps": swaps, "gates": len(result.ops),
+              "cx": sum(1 for op in result.ops if op[0] == "cx"),
+              "depth": depth(result), "cached": bool(cached)}
+    return result, report
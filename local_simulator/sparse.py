@@ -0,0 +1,176 @@
+"""Sparse statevector: {basis state: amplitude} for wide, mostly classical circuits.
+
+A dense state of n qubits needs 2^n amplitudes, which rules out e.g. a
+64-bit adder (130 qubits). Arithmetic circuits only permute basis states,
+though, so a superposition over a few inputs stays a handful of entries.
+Here the state is a dict keyed by the basis state as a Python int (bit q =
+qubit q, any width); x/cx/ccx/swap just rename keys and other gates only
+touch the entries they mix.
+
+`simulate_auto` starts sparse and hands over to the dense engine once the
+state fills more than `FILL_LIMIT` of the 2^n amplitudes, where dict
+overhead stops paying off. Gate fusion only fills a sparse state up, so
+the remaining gates are fused at the hand-over.
+"""
+
+import weakref
+
+import numpy as np
+
+from .counts import Counts
+from .memory import ChunkedState
+from .optimize import fuse_blocks
+from .parallel import draw
+from .statevector import CONTROLLED, gate_matrix
+from .statevector import apply_gate as apply_dense_gate
+
+# amplitudes smaller than this are dropped after each gate
+EPSILON = 1e-12
+
+# fraction of non-zero amplitudes above which `simulate_auto` goes dense
+FILL_LIMIT = 0.1
+
+# program -> {(position, max_fused_qubits): fused gates after position}
+_DENSE_TAILS = weakref.WeakKeyDictionary()
+
+
+def _prune(state):
+    return dict((k, a) for k, a in state.items() if abs(a) > EPSILON)
+
+
+def _apply_matrix(state, matrix, target, controls):
+    mask = 0
+    for control in controls:
+        mask |= 1 << control
+    flip = 1 << target
+    result = {}
+    for key, amplitude in state.items():
+        if key & mask != mask:
+            result[key] = result.get(key, 0) + amplitude
+            continue
+        bit = key >> target & 1
+        base = key & ~flip
+        for row, new_key in ((0, base), (1, base | flip)):
+            element = matrix[row, bit]
+            if element != 0:
+                result[new_key] = result.get(new_key, 0) + element * amplitude
+    return _prune(result)
+
+
+def _apply_unitary(state, matrix, qubits):
+    clear = ~sum(1 << q for q in qubits)
+    spread = []
+    for local in range(1 << len(qubits)):
+        spread.append(sum(((local >> i) & 1) << q for i, q in enumerate(qubits)))
+    result = {}
+    for key, amplitude in state.items():
+        column = sum(((key >> q) & 1) << i for i, q in enumerate(qubits))
+        base = key & clear
+        for row, bits in enumerate(spread):
+            element = matrix[row, column]
+            if element != 0:
+                new_key = base | bits
+                result[new_key] = result.get(new_key, 0) + element * amplitude
+    return _prune(result)
+
+
+def apply_gate(state, name, qubits, params=()):
+    """Return the new sparse state after one gate."""
+    if name == "id":
+        return state
+    if name == "x":
+        flip = 1 << qubits[0]
+        return dict((k ^ flip, a) for k, a in state.items())
+    if name == "cx":
+        c, t = qubits
+        return dict((k ^ (k >> c & 1) << t, a) for k, a in state.items())
+    if name == "ccx":
+        c1, c2, t = qubits
+        return dict((k ^ (k >> c1 & k >> c2 & 1) << t, a) for k, a in state.items())
+    if name == "swap":
+        a, b = qubits
+        both = (1 << a) | (1 << b)
+        return dict((k ^ both if (k >> a & 1) != (k >> b & 1) else k, amp)
+                    for k, amp in state.items())
+    if name == "unitary":
+        return _apply_unitary(state, params[0], qubits)
+    if name in CONTROLLED:
+        num_controls, base = CONTROLLED[name]
+        return _apply_matrix(state, gate_matrix(base, params),
+                             qubits[num_controls], qubits[:num_controls])
+    return _apply_matrix(state, gate_matrix(name, params), qubits[0], ())
+
+
+def simulate_sparse(program, state=None):
+    """Run every gate of `program` on a sparse state (|0...0> by default)."""
+    if state is None:
+        state = {0: 1 + 0j}
+    for name, qubits, params in program.ops:
+        state = apply_gate(state, name, qubits, params)
+    return state
+
+
+def to_dense(state, num_qubits):
+    """Dense (2,) * n array holding the same amplitudes as a sparse state."""
+    dense = np.zeros(1 << num_qubits, dtype=complex)
+    dense[np.fromiter(state, dtype=np.int64, count=len(state))] = list(state.values())
+    return dense.reshape((2,) * num_qubits)
+
+
+def _dense_tail(program, position, max_fused_qubits):
+    """Gates after `position`, fused for the dense engine (cached)."""
+    tails = _DENSE_TAILS.setdefault(program, {})
+    key = (position, max_fused_qubits)
+    if key not in tails:
+        rest = program.ops[position + 1:]
+        tails[key] = fuse_blocks(rest, max_fused_qubits) if max_fused_qubits > 0 else rest
+    return tails[key]
+
+
+def simulate_auto(program, max_dense_qubits, max_entries=None, max_fused_qubits=0):
+    """Simulate sparsely, switching to dense when the state fills up.
+
+    Returns ("sparse", dict), ("dense", array) or ("chunked", ChunkedState).
+    Circuits wider than `max_dense_qubits` stay sparse whatever their fill,
+    unless the dict grows beyond `max_entries`: then the run continues on
+    a memory-mapped `memory.ChunkedState`. After a switch to dense, the
+    remaining gates are fused into blocks of up to `max_fused_qubits`.
+    """
+    state = {0: 1 + 0j}
+    num_qubits = program.num_qubits
+    limit = FILL_LIMIT * (1 << num_qubits) if num_qubits <= max_dense_qubits else None
+    for position, (name, qubits, params) in enumerate(program.ops):
+        state = apply_gate(state, name, qubits, params)
+        if limit is not None and len(state) > limit:
+            dense = to_dense(state, num_qubits)
+            for name, qubits, params in _dense_tail(program, position, max_fused_qubits):
+                dense = apply_dense_gate(dense, name, qubits, params)
+            return "dense", dense
+        if max_entries is not None and len(state) > max_entries:
+            chunked = ChunkedState.from_sparse(state, num_qubits)
+            for name, qubits, params in program.ops[position + 1:]:
+                chunked.apply_gate(name, qubits, params)
+            return "chunked", chunked
+    return "sparse", state
+
+
+def readout(program, key):
+    """Classical register value for basis state `key` (trailing measurements)."""
+    value = 0
+    for _, qubit, clbit in program.measures:
+        value = value & ~(1 << clbit) | (key >> qubit & 1) << clbit
+    return value
+
+
+def sample_sparse(program, state, shots, seed=None, workers=0):
+    """Draw `shots` from a sparse state and return `Counts`."""
+    keys = list(state)
+    probs = np.abs(np.array([state[k] for k in keys], dtype=complex)) ** 2
+    hits = draw(probs, shots, seed=seed, workers=workers)
+    counts = {}
+    for key, hit in zip(keys, hits.tolist()):
+        if hit:
+            value = readout(program, key)
+            counts[value] = counts.get(value, 0) + hit
+    return Counts(np.array(list(counts), dtype=object), list(counts.values()),
+                  program.cregs)
@@ -0,0 +1,150 @@
+"""Declarative programs with many circuits, built only when used.
+
+`Q_SPECS` in the tutorial declares one circuit and every example repeats
+it together with the gate calls. `SpecProgram` accepts the same format and
+extends it:
+
+- "register_templates": named register sets shared by several circuits;
+- "subroutines": named gate sequences with formal register parameters
+  (`half_adder(q)` is built in);
+- per circuit, "template" and "gates", a list of QASM statements in which
+  subroutines can be called like gates.
+
+For example::
+
+    specs = {
+        "name": "adders",
+        "register_templates": {"adder": {
+            "quantum_registers": [{"name": "qr", "size": 4}],
+            "classical_registers": [{"name": "cr", "size": 4}]}},
+        "circuits": [
+            {"name": "1+1", "template": "adder",
+             "gates": ["x qr[0]", "x qr[1]", "half_adder qr",
+                       "measure qr[0] -> cr[3]", ...]},
+            ...],
+    }
+    program = SpecProgram(specs)
+    local_simulator.execute(program, ["1+1"])
+
+Nothing is parsed in the constructor; a circuit is built the first time
+`get_program` / `get_qasm` (or `execute`) asks for it. Subroutine
+expansions are cached, and circuits that expand to the same text share one
+`Program` object.
+"""
+
+import hashlib
+
+from .cache import normalize_qasm
+from .ir import emit_qasm
+from .qasm import _STATEMENT, QasmError, parse_qasm
+
+BUILTIN_SUBROUTINES = {
+    # the tutorial's half adder: q[2] = q[0] AND q[1], q[3] = q[0] XOR q[1]
+    "half_adder": {"params": ["q"],
+                   "gates": ["ccx q[0],q[1],q[2]", "cx q[0],q[3]", "cx q[1],q[3]"]},
+}
+
+
+def _split(statement):
+    """(name, name with its parameter list, arguments) of one statement."""
+    match = _STATEMENT.match(statement.strip() + ";")
+    if match is None or match.group(1) is None:
+        return statement.strip(), statement.strip(), ""
+    name, params, args = match.group(1, 2, 3)
+    head = name if params is None else "%s(%s)" % (name, params)
+    return name, head, args.strip()
+
+
+def _substitute(statement, mapping):
+    """Replace formal register names in `statement` by the actual ones."""
+    _, name, rest = _split(statement)
+    if not rest:
+        return statement
+    parts = []
+    for arg in rest.replace("->", ",->,").split(","):
+        arg = arg.strip()
+        register, bracket, index = arg.partition("[")
+        if register in mapping:
+            actual = mapping[register]
+            if bracket:
+                if "[" in actual:
+                    raise QasmError("cannot index single qubit %r" % actual)
+                arg = "%s[%s" % (actual, index)
+            else:
+                arg = actual
+        parts.append(arg)
+    return "%s %s" % (name, ",".join(parts).replace(",->,", " -> "))
+
+
+class SpecProgram(object):
+    """Lazily built collection of circuits declared by a specs dict."""
+
+    def __init__(self, specs, subroutines=None):
+        self.name = specs.get("name")
+        self._templates = specs.get("register_templates", {})
+        self._subroutines = dict(BUILTIN_SUBROUTINES)
+        self._subroutines.update(specs.get("subroutines", {}))
+        self._subroutines.update(subroutines or {})
+        self._circuits = dict((c["name"], c) for c in specs.get("circuits", []))
+        self._order = [c["name"] for c in specs.get("circuits", [])]
+        self._programs = {}
+        self._shared = {}
+        self._expansions = {}
+
+    def get_circuit_names(self):
+        return list(self._order)
+
+    def is_built(self, name):
+        return name in self._programs
+
+    def _registers(self, spec):
+        template = self._templates.get(spec.get("template"), {}) if spec.get("template") else {}
+        if spec.get("template") and not template:
+            raise KeyError("unknown register template %r" % spec["template"])
+        quantum = list(template.get("quantum_registers", [])) + list(spec.get("quantum_registers", []))
+        classical = (list(template.get("classical_registers", []))
+                     + list(spec.get("classical_registers", [])))
+        return quantum, classical
+
+    def _expand(self, statement, depth=0):
+        """Statement list with subroutine calls replaced by their bodies."""
+        name, _, rest = _split(statement)
+        if name not in self._subroutines:
+            return (statement.strip(),)
+        key = statement.strip()
+        if key in self._expansions:
+            return self._expansions[key]
+        if depth > 32:
+            raise QasmError("subroutine %s calls itself too deeply" % name)
+        routine = self._subroutines[name]
+        actual = [a.strip() for a in rest.split(",")] if rest.strip() else []
+        if len(actual) != len(routine["params"]):
+            raise QasmError("subroutine %s takes %d registers" % (name, len(routine["params"])))
+        mapping = dict(zip(routine["params"], actual))
+        body = []
+        for inner in routine["gates"]:
+            body.extend(self._expand(_substitute(inner, mapping), depth + 1))
+        self._expansions[key] = tuple(body)
+        return self._expansions[key]
+
+    def _text(self, spec):
+        quantum, classical = self._registers(spec)
+        lines = ["OPENQASM 2.0;", 'include "qelib1.inc";']
+        lines.extend("qreg %s[%d];" % (r["name"], r["size"]) for r in quantum)
+        lines.extend("creg %s[%d];" % (r["name"], r["size"]) for r in classical)
+        for statement in spec.get("gates", []):
+            lines.extend(s + ";" for s in self._expand(statement))
+        return "\n".join(lines) + "\n"
+
+    def get_program(self, name):
+        """Compiled `Program` of circuit `name`, built on first use."""
+        if name not in self._programs:
+            text = self._text(self._circuits[name])
+            key = hashlib.sha256(normalize_qasm(text).encode("utf-8")).hexdigest()
+            if key not in self._shared:
+                self._shared[key] = parse_qasm(text)
+            self._programs[name] = self._shared[key]
+        return self._programs[name]
+
+    def get_qasm(self, name):
+        return emit_qasm(self.get_program(name))
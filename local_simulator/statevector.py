@@ -0,0 +1,149 @@
+"""Dense statevector kept as an n-dimensional array of shape (2,) * n.
+
+Qubit q lives on axis ``ndim - 1 - q``, so ``state.reshape(-1)[i]`` is the
+amplitude of the basis state whose bit q is bit q of i (the same little
+endian order the IBM simulators use). Gates never build a 2^n x 2^n matrix:
+a k-qubit gate is a 2x2 tensordot on one axis of the sub-array selected by
+fixing the control axes to 1. Any leading axes in front of the qubit axes are
+treated as batch axes and are carried through untouched.
+"""
+
+import cmath
+import math
+
+import numpy as np
+
+_SQRT1_2 = 1 / math.sqrt(2)
+
+
+def _u3(theta, phi, lam):
+    return np.array([
+        [math.cos(theta / 2), -cmath.exp(1j * lam) * math.sin(theta / 2)],
+        [cmath.exp(1j * phi) * math.sin(theta / 2),
+         cmath.exp(1j * (phi + lam)) * math.cos(theta / 2)],
+    ], dtype=complex)
+
+
+def _rx(theta):
+    c, s = math.cos(theta / 2), math.sin(theta / 2)
+    return np.array([[c, -1j * s], [-1j * s, c]], dtype=complex)
+
+
+def _ry(theta):
+    c, s = math.cos(theta / 2), math.sin(theta / 2)
+    return np.array([[c, -s], [s, c]], dtype=complex)
+
+
+def _rz(theta):
+    return np.array([[cmath.exp(-0.5j * theta), 0],
+                     [0, cmath.exp(0.5j * theta)]], dtype=complex)
+
+
+def _phase(lam):
+    return np.array([[1, 0], [0, cmath.exp(1j * lam)]], dtype=complex)
+
+
+_FIXED = {
+    "id": np.eye(2, dtype=complex),
+    "x": np.array([[0, 1], [1, 0]], dtype=complex),
+    "y": np.array([[0, -1j], [1j, 0]], dtype=complex),
+    "z": np.array([[1, 0], [0, -1]], dtype=complex),
+    "h": np.array([[_SQRT1_2, _SQRT1_2], [_SQRT1_2, -_SQRT1_2]], dtype=complex),
+    "s": _phase(math.pi / 2),
+    "sdg": _phase(-math.pi / 2),
+    "t": _phase(math.pi / 4),
+    "tdg": _phase(-math.pi / 4),
+}
+
+_PARAMETRIC = {
+    "rx": _rx, "ry": _ry, "rz": _rz, "u1": _phase,
+    "u2": lambda phi, lam: _u3(math.pi / 2, phi, lam),
+    "u3": _u3, "u": _u3,
+}
+
+# controlled gates: name -> (number of controls, name of the target gate)
+CONTROLLED = {
+    "cx": (1, "x"), "cy": (1, "y"), "cz": (1, "z"), "ch": (1, "h"),
+    "cu1": (1, "u1"), "ccx": (2, "x"),
+}
+
+# gates that only permute basis states; applied with a flip instead of a product
+PERMUTATIONS = frozenset(["x", "cx", "ccx", "swap"])
+
+
+def gate_matrix(name, params=()):
+    """Return the 2x2 matrix of a single-qubit gate."""
+    if name in _FIXED:
+        return _FIXED[name]
+    return _PARAMETRIC[name](*params)
+
+
+def zero_state(num_qubits, batch_shape=()):
+    """|0...0> (repeated over `batch_shape`)."""
+    state = np.zeros(tuple(batch_shape) + (2,) * num_qubits, dtype=complex)
+    state[(Ellipsis,) + (0,) * num_qubits] = 1
+    return state
+
+
+def select(ndim, target, controls):
+    """Index fixing the control axes to 1, and the target axis inside it."""
+    index = [slice(None)] * ndim
+    for control in controls:
+        index[ndim - 1 - control] = 1
+    axis = ndim - 1 - target
+    # fixing the control axes removes them, shifting the target axis left
+    axis -= sum(1 for c in controls if ndim - 1 - c < axis)
+    return tuple(index), axis
+
+
+def apply_matrix(state, matrix, target, controls=()):
+    """Apply a 2x2 `matrix` to qubit `target`, conditioned on `controls`."""
+    index, axis = select(state.ndim, target, controls)
+    result = np.tensordot(matrix, state[index], axes=([1], [axis]))
+    state[index] = np.moveaxis(result, 0, axis)
+    return state
+
+
+def apply_unitary(state, matrix, qubits):
+    """Apply a dense 2^k x 2^k `matrix`; bit i of its index is qubits[i]."""
+    k = len(qubits)
+    tensor = matrix.reshape((2,) * (2 * k))
+    # tensor axes run from the highest to the lowest local qubit
+    axes = [state.ndim - 1 - q for q in reversed(qubits)]
+    result = np.tensordot(tensor, state, axes=(list(range(k, 2 * k)), axes))
+    return np.moveaxis(result, list(range(k)), axes)
+
+
+def apply_gate(state, name, qubits, params=()):
+    """Apply one gate in place (where possible) and return the state."""
+    ndim = state.ndim
+    if name == "unitary":
+        return apply_unitary(state, params[0], qubits)
+    if name == "swap":
+        a, b = ndim - 1 - qubits[0], ndim - 1 - qubits[1]
+        return np.ascontiguousarray(np.swapaxes(state, a, b))
+    if name in CONTROLLED:
+        num_controls, base = CONTROLLED[name]
+        controls, target = qubits[:num_controls], qubits[num_controls]
+    else:
+        base, controls, target = name, (), qubits[0]
+    if name in PERMUTATIONS:
+        index, axis = select(ndim, target, controls)
+        state[index] = np.flip(state[index], axis).copy()
+        return state
+    return apply_matrix(state, gate_matrix(base, params), target, controls)
+
+
+def simulate(program, state=None):
+    """Run every gate of `program` on `state` (|0...0> by default)."""
+    if state is None:
+        state = zero_state(program.num_qubits)
+    for name, qubits, params in program.ops:
+        state = apply_gate(state, name, qubits, params)
+    return state
+
+
+def probabilities(state, num_qubits):
+    """|amplitude|^2 flattened over the qubit axes (batch axes are kept)."""
+    batch_shape = state.shape[:state.ndim - num_qubits]
+    return (np.abs(state) ** 2).reshape(batch_shape + (-1,))
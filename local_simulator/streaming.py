@@ -0,0 +1,113 @@
+"""Streaming shots for very large shot counts.
+
+`run_qasm` returns once all shots are drawn. For 10^6-10^8 shots it is
+often enough to watch the histogram converge and stop early, so
+`stream_counts` draws the shots in chunks and yields a running histogram:
+an int64 array indexed by the classical register value (`cr` read as an
+integer, cr[0] the lowest bit). Only the histogram is kept, so memory does
+not grow with the number of shots::
+
+    for done, hist in local_simulator.stream_counts(qasm, shots=10**8):
+        low, high = local_simulator.proportion_interval(hist[0b1110], done)
+        if high - low < 1e-3:
+            break
+"""
+
+import math
+
+import numpy as np
+
+from .backend import (MAX_DENSE_QUBITS, SimulatorError, check_trailing_measures,
+                      clbit_values, load)
+from .classical import classical_outcome, is_classical
+from .optimize import optimize
+from .sparse import simulate_auto
+
+# histograms are dense over all register values, so keep them reasonably small
+MAX_CLBITS = 26
+
+
+def outcome_support(program):
+    """(register values, probabilities) of the outcomes that can occur.
+
+    The state comes from the sparse/auto engine like in `run_qasm`, so wide
+    circuits with a small support do not need a dense state.
+    """
+    if is_classical(program):
+        return np.array([classical_outcome(program)], dtype=object), np.ones(1)
+    check_trailing_measures(program)
+    kind, state = simulate_auto(optimize(program, max_fused_qubits=0), MAX_DENSE_QUBITS,
+                                max_fused_qubits=2)
+    if kind == "sparse":
+        # keys wider than 63 bits stay Python ints
+        basis = np.array(list(state), dtype=object)
+        probs = np.abs(np.array(list(state.values()), dtype=complex)) ** 2
+    else:
+        probs = np.abs(state.reshape(-1)) ** 2
+        basis = np.flatnonzero(probs)
+        probs = probs[basis]
+    return clbit_values(program, basis), probs
+
+
+def outcome_probabilities(program):
+    """Probability of every classical register value, as a dense array."""
+    if program.num_clbits > MAX_CLBITS:
+        raise SimulatorError("%d classical bits is too wide for a dense histogram"
+                             % program.num_clbits)
+    values, weights = outcome_support(program)
+    probs = np.zeros(1 << program.num_clbits)
+    np.add.at(probs, values.astype(np.int64), weights)
+    return probs / probs.sum()
+
+
+def stream_counts(qasm, shots, chunk_size=1 << 20, seed=None, cache=None):
+    """Yield (shots_done, histogram) after every chunk of at most `chunk_size`.
+
+    The same histogram array is updated in place and yielded each time;
+    copy it if an intermediate snapshot has to be kept.
+    """
+    program = load(qasm, cache)
+    probs = outcome_probabilities(program)
+    rng = np.random.default_rng(seed)
+    hist = np.zeros(len(probs), dtype=np.int64)
+    done = 0
+    while done < shots:
+        chunk = min(chunk_size, shots - done)
+        hist += rng.multinomial(chunk, probs)
+        done += chunk
+        yield done, hist
+
+
+def counts_until(qasm, stop, shots, chunk_size=1 << 20, seed=None, cache=None):
+    """Stream shots until `stop(shots_done, histogram)` is true or `shots` run out.
+
+    Returns (shots_done, histogram).
+    """
+    done, hist = 0, None
+    for done, hist in stream_counts(qasm, shots, chunk_size, seed, cache):
+        if stop(done, hist):
+            break
+    return done, hist
+
+
+def iter_shot_memory(qasm, shots, chunk_size=1 << 20, seed=None, cache=None):
+    """Yield the register value of every shot, in chunks of uint64 arrays."""
+    program = load(qasm, cache)
+    probs = outcome_probabilities(program)
+    rng = np.random.default_rng(seed)
+    done = 0
+    while done < shots:
+        chunk = min(chunk_size, shots - done)
+        yield rng.choice(len(probs), size=chunk, p=probs).astype(np.uint64)
+        done += chunk
+
+
+def proportion_interval(hits, total, z=1.96):
+    """Wilson score interval for an outcome seen `hits` times in `total` shots."""
+    if total == 0:
+        return 0.0, 1.0
+    p = hits / total
+    denominator = 1 + z * z / total
+    centre = (p + z * z / (2 * total)) / denominator
+    spread = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return max(0.0, centre - spread), min(1.0, centre + spread)
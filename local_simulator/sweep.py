@@ -0,0 +1,135 @@
+"""Parameter sweeps: compile once, simulate every binding in one batched pass.
+
+Instead of editing `circuit.x(...)` lines and building a new program for
+every input, the inputs become parameters. Rotation angles are written as
+symbolic gate parameters and input bits are mapped to qubits that start in
+|1> when the bit is set::
+
+    qasm = '''
+    qreg qr[4]; creg cr[4];
+    ry(theta) qr[0];
+    ccx qr[0],qr[1],qr[2]; cx qr[0],qr[3]; cx qr[1],qr[3];
+    measure qr -> cr;
+    '''
+    points = grid(theta=np.linspace(0, np.pi, 100), b=[0, 1])
+    probs = run_sweep(qasm, points, input_bits={1: "b"})   # shape (200, 16)
+
+The statevector carries the sweep points on a leading batch axis, so gates
+without parameters are applied once for all points and parameterised gates
+become one batched matrix product.
+"""
+
+import numpy as np
+
+from .backend import check_trailing_measures, clbit_values
+from .counts import Counts
+from .qasm import Expression, Program, parse_qasm
+from .statevector import CONTROLLED, apply_gate, probabilities, select
+
+
+def grid(**axes):
+    """Cartesian product of the given values as {name: flat array}."""
+    names = sorted(axes)
+    meshes = np.meshgrid(*[np.asarray(axes[n], dtype=float) for n in names],
+                         indexing="ij")
+    return dict((n, m.reshape(-1)) for n, m in zip(names, meshes))
+
+
+def _batched_matrices(name, values):
+    """Stack of 2x2 matrices, one per sweep point."""
+    if name == "rx":
+        c, s = np.cos(values[0] / 2), np.sin(values[0] / 2)
+        rows = [[c, -1j * s], [-1j * s, c]]
+    elif name == "ry":
+        c, s = np.cos(values[0] / 2), np.sin(values[0] / 2)
+        rows = [[c, -s], [s, c]]
+    elif name == "rz":
+        zero = np.zeros_like(values[0])
+        rows = [[np.exp(-0.5j * values[0]), zero], [zero, np.exp(0.5j * values[0])]]
+    elif name == "u1":
+        one, zero = np.ones_like(values[0]), np.zeros_like(values[0])
+        rows = [[one, zero], [zero, np.exp(1j * values[0])]]
+    else:
+        if name == "u2":
+            theta, phi, lam = np.full_like(values[0], np.pi / 2), values[0], values[1]
+        else:
+            theta, phi, lam = values
+        c, s = np.cos(theta / 2), np.sin(theta / 2)
+        rows = [[c, -np.exp(1j * lam) * s],
+                [np.exp(1j * phi) * s, np.exp(1j * (phi + lam)) * c]]
+    matrices = np.empty((len(values[0]), 2, 2), dtype=complex)
+    for i in range(2):
+        for j in range(2):
+            matrices[:, i, j] = rows[i][j]
+    return matrices
+
+
+def apply_batched_matrix(state, matrices, target, controls=()):
+    """Apply matrices[b] to qubit `target` of batch row b (batch axis first)."""
+    index, axis = select(state.ndim, target, controls)
+    sub = np.moveaxis(state[index], axis, 1)
+    result = np.einsum("bij,bj...->bi...", matrices, sub)
+    state[index] = np.moveaxis(result, 1, axis)
+    return state
+
+
+def _size(bindings):
+    sizes = set(np.size(v) for v in bindings.values())
+    sizes.discard(1)
+    if len(sizes) > 1:
+        raise ValueError("all bound parameters need the same number of points")
+    return sizes.pop() if sizes else 1
+
+
+def sweep_state(program, bindings, input_bits=None):
+    """Batched final statevector, shape (points,) + (2,) * n."""
+    bindings = dict((k, np.asarray(v, dtype=float)) for k, v in bindings.items())
+    size = _size(bindings)
+    n = program.num_qubits
+    start = np.zeros(size, dtype=np.int64)
+    for qubit, name in (input_bits or {}).items():
+        start |= np.broadcast_to(np.asarray(bindings[name]).astype(np.int64) & 1,
+                                 (size,)) << qubit
+    state = np.zeros((size, 1 << n), dtype=complex)
+    state[np.arange(size), start] = 1
+    state = state.reshape((size,) + (2,) * n)
+    for name, qubits, params in program.ops:
+        if not any(isinstance(p, Expression) for p in params):
+            state = apply_gate(state, name, qubits, params)
+            continue
+        values = [np.broadcast_to(p.evaluate(bindings) if isinstance(p, Expression) else p,
+                                  (size,))
+                  for p in params]
+        if name in CONTROLLED:
+            num_controls, base = CONTROLLED[name]
+            controls, target = qubits[:num_controls], qubits[num_controls]
+        else:
+            base, controls, target = name, (), qubits[0]
+        state = apply_batched_matrix(state, _batched_matrices(base, values), target, controls)
+    return state
+
+
+def run_sweep(qasm, bindings, input_bits=None, shots=None, seed=None):
+    """Evaluate a parameterised circuit at every point of `bindings`.
+
+    `bindings` maps parameter names to equal-length arrays (see `grid`);
+    `input_bits` maps qubit indices to the names of 0/1 parameters giving
+    their initial value. Returns the exact outcome probabilities, shape
+    (points, 2 ** num_clbits) indexed by classical register value, or with
+    `shots` a list of sampled `Counts`, one per point.
+    """
+    input_bits = input_bits or {}
+    if isinstance(qasm, Program):
+        program = qasm
+    else:
+        program = parse_qasm(qasm, parameters=set(bindings) - set(input_bits.values()))
+    check_trailing_measures(program)
+    basis = probabilities(sweep_state(program, bindings, input_bits), program.num_qubits)
+    outcomes = np.zeros((basis.shape[0], 1 << program.num_clbits))
+    values = clbit_values(program, np.arange(basis.shape[1]))
+    np.add.at(outcomes, (slice(None), values), basis)
+    if shots is None:
+        return outcomes
+    rng = np.random.default_rng(seed)
+    hits = rng.multinomial(shots, outcomes / outcomes.sum(axis=1, keepdims=True))
+    return [Counts.from_histogram(row, program.cregs) for row in hits]